@@ -0,0 +1,126 @@
+import math
+import threading
+import time
+from config import (
+    API_REQUESTS_PER_SECOND, API_TOKENS_PER_MINUTE, JOB_MAX_REQUESTS, JOB_MAX_TOKENS, IMAGE_TOKEN_ESTIMATE,
+    JOB_RESERVED_REQUESTS, JOB_RESERVED_TOKENS
+)
+
+class BudgetExceeded(Exception):
+    """Raised when a job has no request or token budget left for a model call"""
+
+def estimate_payload_tokens(payload):
+    """Upper-bound token cost of a chat payload: prompt text, images and max completion"""
+    prompt_chars = 0
+    images = 0
+    for message in payload.get("messages", []):
+        content = message.get("content", "")
+        if isinstance(content, str):
+            prompt_chars += len(content)
+            continue
+        for part in content:
+            if part.get("type") == "image_url":
+                images += 1
+            else:
+                prompt_chars += len(part.get("text", ""))
+    return math.ceil(prompt_chars / 4) + images * IMAGE_TOKEN_ESTIMATE + payload.get("max_tokens", 0)
+
+class RateLimiter:
+    """Token-bucket limiter on requests per second and tokens per minute.
+
+    One instance is shared by every session in the server process so that
+    together they stay under the provider's rate limit; callers block in
+    acquire() until there is room.
+    """
+
+    def __init__(self, requests_per_second=API_REQUESTS_PER_SECOND, tokens_per_minute=API_TOKENS_PER_MINUTE):
+        self.request_rate = requests_per_second
+        self.token_rate = tokens_per_minute / 60
+        self.request_capacity = max(1.0, requests_per_second)
+        self.token_capacity = tokens_per_minute
+        self.request_allowance = self.request_capacity
+        self.token_allowance = self.token_capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.updated
+        self.updated = now
+        self.request_allowance = min(self.request_capacity, self.request_allowance + elapsed * self.request_rate)
+        self.token_allowance = min(self.token_capacity, self.token_allowance + elapsed * self.token_rate)
+
+    def acquire(self, tokens):
+        """Block until one request of about `tokens` tokens may be sent"""
+        # A single request larger than the whole bucket must still be able to run
+        tokens = min(tokens, self.token_capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.request_allowance >= 1 and self.token_allowance >= tokens:
+                    self.request_allowance -= 1
+                    self.token_allowance -= tokens
+                    return
+                wait = max(
+                    (1 - self.request_allowance) / self.request_rate,
+                    (tokens - self.token_allowance) / self.token_rate,
+                    0.01
+                )
+            time.sleep(wait)
+
+    def settle(self, reserved_tokens, actual_tokens):
+        """Correct the token bucket once the real usage of a request is known"""
+        with self.lock:
+            self.token_allowance = min(self.token_capacity, self.token_allowance + reserved_tokens - actual_tokens)
+
+GLOBAL_RATE_LIMITER = RateLimiter()
+
+class JobBudget:
+    """Per-job cap on model requests and tokens.
+
+    Every model call for one upload reserves its estimated cost here first.
+    Stages check what is left to scale their work down, and each time work
+    is cut or refused the reason is recorded in `degradations`. Optional
+    work such as frame scoring must leave reserved_requests and
+    reserved_tokens untouched for the article, caption and translations.
+    """
+
+    def __init__(self, max_requests=JOB_MAX_REQUESTS, max_tokens=JOB_MAX_TOKENS,
+                 reserved_requests=JOB_RESERVED_REQUESTS, reserved_tokens=JOB_RESERVED_TOKENS):
+        self.max_requests = max_requests
+        self.max_tokens = max_tokens
+        self.reserved_requests = reserved_requests
+        self.reserved_tokens = reserved_tokens
+        self.requests_used = 0
+        self.tokens_used = 0
+        self.degradations = []
+        self.lock = threading.Lock()
+
+    @property
+    def remaining_requests(self):
+        return max(0, self.max_requests - self.requests_used)
+
+    @property
+    def remaining_tokens(self):
+        return max(0, self.max_tokens - self.tokens_used)
+
+    def can_afford(self, requests=1, tokens=0):
+        return requests <= self.remaining_requests and tokens <= self.remaining_tokens
+
+    def reserve(self, tokens, purpose="model request"):
+        """Claim one request and its estimated tokens, or raise BudgetExceeded"""
+        with self.lock:
+            if not self.can_afford(1, tokens):
+                reason = f"Skipped {purpose}: job budget exhausted ({self.requests_used}/{self.max_requests} requests, {self.tokens_used}/{self.max_tokens} tokens used)"
+                self.degradations.append(reason)
+                raise BudgetExceeded(reason)
+            self.requests_used += 1
+            self.tokens_used += tokens
+
+    def settle(self, reserved_tokens, actual_tokens):
+        with self.lock:
+            self.tokens_used += actual_tokens - reserved_tokens
+
+    def record_degradation(self, reason):
+        with self.lock:
+            self.degradations.append(reason)
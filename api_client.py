@@ -0,0 +1,55 @@
+import json
+import threading
+from config import DEPLOYMENT_URL, HEADERS, HTTP_POOL_SIZE
+from api_budget import GLOBAL_RATE_LIMITER, estimate_payload_tokens
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+class ApiError(Exception):
+    """Raised when the model endpoint does not return a usable completion"""
+
+def get_http_session():
+    """Shared requests session so every call reuses pooled keep-alive connections"""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            import requests
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update(HEADERS)
+            _http_session = session
+    return _http_session
+
+def post_chat_completion(payload, budget=None, purpose="model request", prepaid=False):
+    """Send a chat completion request and return (content, usage).
+
+    Every call goes through the shared rate limiter and, when a JobBudget is
+    given, is charged to that job first (raising BudgetExceeded if it cannot
+    be afforded). With prepaid the caller has already reserved the
+    payload's estimate on the budget, so it is only settled here. usage is
+    the provider's token accounting
+    ({"prompt_tokens", "completion_tokens", "total_tokens"}), or an empty
+    dict if it is missing.
+    """
+    estimated_tokens = estimate_payload_tokens(payload)
+    if budget and not prepaid:
+        budget.reserve(estimated_tokens, purpose)
+    GLOBAL_RATE_LIMITER.acquire(estimated_tokens)
+
+    actual_tokens = 0
+    try:
+        response = get_http_session().post(DEPLOYMENT_URL, data=json.dumps(payload))
+        if response.status_code != 200:
+            raise ApiError(f"API Error {response.status_code}: {response.text}")
+
+        body = response.json()
+        usage = body.get('usage') or {}
+        actual_tokens = usage.get('total_tokens', estimated_tokens)
+        return body['choices'][0]['message']['content'], usage
+    finally:
+        GLOBAL_RATE_LIMITER.settle(estimated_tokens, actual_tokens)
+        if budget:
+            budget.settle(estimated_tokens, actual_tokens)
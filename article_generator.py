@@ -1,9 +1,11 @@
-import requests
-import json
+import time
 import streamlit as st
-from config import DEPLOYMENT_URL, HEADERS
+from concurrent.futures import ThreadPoolExecutor
+from config import TRANSLATION_WORKERS, ARTICLE_TRANSCRIPT_MAX_TOKENS, ARTICLE_DESCRIPTIONS_MAX_TOKENS
+from api_client import ApiError, post_chat_completion
+from api_budget import BudgetExceeded, estimate_payload_tokens
 
-def generate_article_from_text(raw_data, output_language="English"):
+def generate_article_from_text(raw_data, output_language="English", budget=None):
     """Generate news article from raw text data only, in specified language"""
     prompt = f"""
 You are a multilingual sports journalist.
@@ -35,19 +37,20 @@ Now write the full article in **{output_language}**:
     }
 
     try:
-        response = requests.post(DEPLOYMENT_URL, headers=HEADERS, data=json.dumps(payload))
-        if response.status_code == 200:
-            return response.json()['choices'][0]['message']['content']
-        else:
-            st.error(f"API Error {response.status_code}: {response.text}")
+        content, _ = post_chat_completion(payload, budget, "article")
+        return content
+    except ApiError as e:
+        st.error(str(e))
+    except BudgetExceeded as e:
+        st.warning(str(e))
     except Exception as e:
         st.error(f"Error generating article: {str(e)}")
 
     return "[Error generating article]"
 
 
-def generate_short_caption(frame_description, output_language="English"):
-    """Generate a short 1-2 line caption for the key frame, in specified language"""
+def _caption_payload(frame_description, output_language):
+    """Build the chat payload for a key-frame caption"""
     prompt = f"""
 You are a multilingual sports journalist.
 
@@ -59,7 +62,7 @@ FRAME DESCRIPTION:
 The caption should be concise, descriptive, and match the tone of a professional news site.
 """
 
-    payload = {
+    return {
         "messages": [
             {"role": "system", "content": f"You write captions for international sports media in {output_language}."},
             {"role": "user", "content": prompt}
@@ -67,22 +70,80 @@ The caption should be concise, descriptive, and match the tone of a professional
         "max_tokens": 70
     }
 
+
+def generate_short_caption(frame_description, output_language="English", budget=None):
+    """Generate a short 1-2 line caption for the key frame, in specified language"""
+    payload = _caption_payload(frame_description, output_language)
+
     try:
-        response = requests.post(DEPLOYMENT_URL, headers=HEADERS, data=json.dumps(payload))
-        if response.status_code == 200:
-            return response.json()['choices'][0]['message']['content'].strip()
+        content, _ = post_chat_completion(payload, budget, "caption")
+        return content.strip()
+    except (ApiError, BudgetExceeded):
+        # Fall back to the generic caption; budget skips are recorded on the job
+        pass
     except Exception as e:
         st.warning(f"Error generating caption: {str(e)}")
 
     return "Key moment from the match"
 
 
-def generate_article(transcript, all_descriptions, best_frame_data, output_language="English"):
-    """Generate news article from transcript and descriptions, in specified language"""
-    descriptions_text = "\n".join([
+def _fit_transcript(transcript, max_tokens=ARTICLE_TRANSCRIPT_MAX_TOKENS):
+    """Thin a timestamped transcript to evenly spaced lines within max_tokens"""
+    max_chars = max_tokens * 4
+    if len(transcript) <= max_chars:
+        return transcript
+
+    lines = transcript.split("\n")
+    keep = max(1, int(len(lines) * max_chars / len(transcript)))
+    while True:
+        kept = [lines[int((i + 0.5) * len(lines) / keep)] for i in range(keep)]
+        text = "\n".join(kept)
+        if len(text) <= max_chars or keep == 1:
+            return text[:max_chars]
+        keep = max(1, int(keep * 0.9))
+
+
+def _fit_descriptions(all_descriptions, max_tokens=ARTICLE_DESCRIPTIONS_MAX_TOKENS):
+    """Frame analysis lines for the highest-scoring frames that fit max_tokens, in video order"""
+    lines = [
         f"Frame {i+1}: {desc['description']} (Importance: {desc['score']}/10)"
         for i, desc in enumerate(all_descriptions)
-    ])
+    ]
+    chosen = []
+    used = 0
+    for i in sorted(range(len(lines)), key=lambda i: -all_descriptions[i]['score']):
+        cost = len(lines[i]) // 4 + 1
+        if used + cost <= max_tokens:
+            chosen.append(i)
+            used += cost
+    return "\n".join(lines[i] for i in sorted(chosen))
+
+
+def estimate_article_reserve(language_count=1):
+    """Upper bound on the (requests, tokens) of a job's article, caption and translations.
+
+    The transcript and frame analysis are capped in _article_payload, so
+    the bound holds however long the match is.
+    """
+    placeholder_frame = {"description": "x" * 1200, "score": 10, "reason": "x" * 400}
+    article = (
+        estimate_payload_tokens(_article_payload("", [], placeholder_frame, "French (Canada)"))
+        + ARTICLE_TRANSCRIPT_MAX_TOKENS + ARTICLE_DESCRIPTIONS_MAX_TOKENS
+    )
+    caption = estimate_payload_tokens(_caption_payload(placeholder_frame["description"], "French (Canada)"))
+    translation = (
+        estimate_payload_tokens(_localize_payload("x" * 2000, "French (Canada)", "French (Canada)", 700))
+        + estimate_payload_tokens(_localize_payload("x" * 400, "French (Canada)", "French (Canada)", 100))
+    )
+    extra_languages = max(0, language_count - 1)
+    return 2 + 2 * extra_languages, article + caption + extra_languages * translation
+
+
+def _article_payload(transcript, all_descriptions, best_frame_data, output_language):
+    """Build the chat payload for the full video analysis article"""
+    # Long matches are thinned so the prompt stays within the job's reserved budget
+    transcript = _fit_transcript(transcript)
+    descriptions_text = _fit_descriptions(all_descriptions)
 
     prompt = f"""
 You are a multilingual sports journalist.
@@ -114,7 +175,7 @@ Reason: {best_frame_data['reason']}
 Now, write the article in **{output_language}**:
 """
 
-    payload = {
+    return {
         "messages": [
             {"role": "system", "content": f"You are a professional journalist who always writes in {output_language}."},
             {"role": "user", "content": prompt}
@@ -122,12 +183,18 @@ Now, write the article in **{output_language}**:
         "max_tokens": 500
     }
 
+
+def generate_article(transcript, all_descriptions, best_frame_data, output_language="English", budget=None):
+    """Generate news article from transcript and descriptions, in specified language"""
+    payload = _article_payload(transcript, all_descriptions, best_frame_data, output_language)
+
     try:
-        response = requests.post(DEPLOYMENT_URL, headers=HEADERS, data=json.dumps(payload))
-        if response.status_code == 200:
-            return response.json()['choices'][0]['message']['content']
-        else:
-            st.error(f"API Error {response.status_code}: {response.text}")
+        content, _ = post_chat_completion(payload, budget, "article")
+        return content
+    except ApiError as e:
+        st.error(str(e))
+    except BudgetExceeded as e:
+        st.warning(str(e))
     except Exception as e:
         st.error(f"Error generating article: {str(e)}")
 
@@ -165,12 +232,115 @@ Now, return the fully edited article in **{output_language}**:
     }
 
     try:
-        response = requests.post(DEPLOYMENT_URL, headers=HEADERS, data=json.dumps(payload))
-        if response.status_code == 200:
-            return response.json()['choices'][0]['message']['content']
-        else:
-            st.error(f"API Error {response.status_code}: {response.text}")
+        content, _ = post_chat_completion(payload, purpose="article edit")
+        return content
+    except ApiError as e:
+        st.error(str(e))
     except Exception as e:
         st.error(f"Error editing article: {str(e)}")
 
     return "[Error editing article]"
+
+
+def _localize_payload(text, source_language, target_language, max_tokens):
+    """Build a short translation/localization payload for finished copy"""
+    prompt = f"""
+Translate and localize the following {source_language} sports news copy into **{target_language}**.
+
+RULES:
+- Keep every fact, name, number and score exactly as in the original
+- Use natural, idiomatic sports journalism style for {target_language} readers
+- Keep the same structure (headline and paragraphs)
+- Return only the translated text
+
+ORIGINAL ({source_language}):
+{text}
+"""
+
+    return {
+        "messages": [
+            {"role": "system", "content": f"You are a professional sports translator who writes in {target_language}."},
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": max_tokens
+    }
+
+
+def _timed_completion(payload, budget=None, purpose="model request"):
+    """Run one completion and return its content, token usage and latency"""
+    start = time.perf_counter()
+    try:
+        content, usage = post_chat_completion(payload, budget, purpose)
+        error = None
+    except Exception as e:
+        content, usage, error = None, {}, str(e)
+    return {
+        "content": content.strip() if content else None,
+        "tokens": usage.get("total_tokens", 0),
+        "latency": time.perf_counter() - start,
+        "error": error
+    }
+
+
+def generate_multilingual_articles(transcript, all_descriptions, best_frame_data, languages, max_workers=TRANSLATION_WORKERS, budget=None):
+    """Generate one canonical article, then localize it into the other languages.
+
+    Only the first language pays for the full transcript and frame analysis
+    prompt; every other language is produced concurrently by short
+    translation prompts against the canonical article and caption. Returns
+    {language: {"article", "caption", "tokens", "latency", "error"}}, with
+    tokens and latency covering both the article and caption for that
+    language. Languages the job budget cannot cover are reported with the
+    budget error instead of an article.
+    """
+    canonical_language = languages[0]
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        article_future = executor.submit(
+            _timed_completion, _article_payload(transcript, all_descriptions, best_frame_data, canonical_language),
+            budget, "article"
+        )
+        caption_future = executor.submit(
+            _timed_completion, _caption_payload(best_frame_data['description'], canonical_language),
+            budget, "caption"
+        ) if best_frame_data else None
+        canonical_article = article_future.result()
+        canonical_caption = caption_future.result() if caption_future else None
+
+    results = {canonical_language: _language_result(canonical_article, canonical_caption)}
+    if not canonical_article["content"]:
+        # Nothing to localize; report the failure for every language
+        for language in languages[1:]:
+            results[language] = dict(results[canonical_language], tokens=0, latency=0.0)
+        return results
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for language in languages[1:]:
+            article_future = executor.submit(
+                _timed_completion, _localize_payload(canonical_article["content"], canonical_language, language, 700),
+                budget, f"{language} article"
+            )
+            caption_future = executor.submit(
+                _timed_completion, _localize_payload(canonical_caption["content"], canonical_language, language, 100),
+                budget, f"{language} caption"
+            ) if canonical_caption and canonical_caption["content"] else None
+            futures[language] = (article_future, caption_future)
+
+        for language, (article_future, caption_future) in futures.items():
+            results[language] = _language_result(
+                article_future.result(), caption_future.result() if caption_future else None
+            )
+
+    return results
+
+
+def _language_result(article, caption):
+    caption = caption or {"content": None, "tokens": 0, "latency": 0.0, "error": None}
+    return {
+        "article": article["content"] or "[Error generating article]",
+        "caption": caption["content"] or "Key moment from the match",
+        "tokens": article["tokens"] + caption["tokens"],
+        # Article and caption requests run concurrently
+        "latency": max(article["latency"], caption["latency"]),
+        "error": article["error"] or caption["error"]
+    }
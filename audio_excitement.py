@@ -0,0 +1,138 @@
+import math
+from config import (
+    EXCITEMENT_HOP_SECONDS, EXCITEMENT_BASELINE_SECONDS, EXCITEMENT_THRESHOLD, EXCITEMENT_MIN_GAP_SECONDS,
+    EXCITEMENT_WINDOW_BEFORE, EXCITEMENT_WINDOW_AFTER, EXCITEMENT_DENSE_FPS, EXCITEMENT_SPARSE_FPS,
+    DEFAULT_GROUP_SIZE
+)
+from audio_processor import extract_audio, load_pcm
+
+def compute_excitement_envelope(samples, sample_rate, hop_seconds=EXCITEMENT_HOP_SECONDS):
+    """Loudness and 1-4 kHz spectral energy envelopes of PCM audio.
+
+    Crowd roars and a commentator's raised, higher-pitched voice push
+    energy into the 1-4 kHz band, so that band rises more sharply than
+    overall loudness at key moments. Returns (times, loudness_db,
+    band_energy_db), one value per hop.
+    """
+    import numpy as np
+
+    hop = int(sample_rate * hop_seconds)
+    hop_count = len(samples) // hop
+    if hop_count == 0:
+        return np.empty(0), np.empty(0), np.empty(0)
+
+    freqs = np.fft.rfftfreq(hop, 1.0 / sample_rate)
+    band = (freqs >= 1000) & (freqs <= 4000)
+    window = np.hanning(hop).astype(np.float32)
+
+    loudness = np.empty(hop_count, dtype=np.float32)
+    band_energy = np.empty(hop_count, dtype=np.float32)
+    block = 1024  # hops per FFT batch keeps memory flat on full matches
+    for first in range(0, hop_count, block):
+        last = min(first + block, hop_count)
+        frames = samples[first * hop:last * hop].reshape(-1, hop)
+        loudness[first:last] = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+        power = np.abs(np.fft.rfft(frames * window, axis=1)[:, band]) ** 2
+        band_energy[first:last] = 10 * np.log10(np.sum(power, axis=1) + 1e-10)
+
+    times = (np.arange(hop_count) + 0.5) * hop_seconds
+    return times, loudness, band_energy
+
+def _robust_zscore(values, baseline_hops):
+    """Deviation from a rolling median baseline, in robust standard deviations"""
+    import numpy as np
+
+    half = baseline_hops // 2
+    padded = np.pad(values, half, mode="edge")
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * half + 1)
+    baseline = np.median(windows, axis=1)
+    deviation = values - baseline
+    spread = 1.4826 * np.median(np.abs(deviation - np.median(deviation))) or 1.0
+    return deviation / spread
+
+def detect_excitement_peaks(samples, sample_rate, threshold=EXCITEMENT_THRESHOLD,
+                            min_gap_seconds=EXCITEMENT_MIN_GAP_SECONDS, hop_seconds=EXCITEMENT_HOP_SECONDS,
+                            baseline_seconds=EXCITEMENT_BASELINE_SECONDS):
+    """Find moments where loudness and 1-4 kHz energy jump above their local baseline.
+
+    threshold is the sensitivity in robust standard deviations: lower finds
+    more, smaller peaks. Peaks closer than min_gap_seconds keep only the
+    strongest. Returns [{"time", "score"}] ordered by time.
+    """
+    import numpy as np
+
+    times, loudness, band_energy = compute_excitement_envelope(samples, sample_rate, hop_seconds)
+    if len(times) == 0:
+        return []
+
+    baseline_hops = max(3, int(baseline_seconds / hop_seconds))
+    excitement = (_robust_zscore(loudness, baseline_hops) + _robust_zscore(band_energy, baseline_hops)) / 2
+
+    # Smooth over about two seconds so a single shout does not count as a moment
+    smoothing = max(1, int(2 / hop_seconds))
+    excitement = np.convolve(excitement, np.ones(smoothing) / smoothing, mode="same")
+
+    candidates = [
+        index for index in range(len(excitement))
+        if excitement[index] >= threshold
+        and excitement[index] >= excitement[max(0, index - 1)]
+        and excitement[index] >= excitement[min(len(excitement) - 1, index + 1)]
+    ]
+
+    peaks = []
+    for index in sorted(candidates, key=lambda i: -excitement[i]):
+        if all(abs(times[index] - peak["time"]) >= min_gap_seconds for peak in peaks):
+            peaks.append({"time": float(times[index]), "score": float(excitement[index])})
+
+    return sorted(peaks, key=lambda peak: peak["time"])
+
+def excitement_windows(peaks, duration, window_before=EXCITEMENT_WINDOW_BEFORE, window_after=EXCITEMENT_WINDOW_AFTER):
+    """Time windows, as (start, end) seconds, sampled densely around the peaks.
+
+    The window reaches further before a peak than after it because the
+    crowd reacts to the action. Overlapping windows are merged.
+    """
+    windows = []
+    for peak in peaks:
+        start = max(0.0, peak["time"] - window_before)
+        end = min(duration, peak["time"] + window_after)
+        if windows and start <= windows[-1][1]:
+            windows[-1] = (windows[-1][0], max(windows[-1][1], end))
+        else:
+            windows.append((start, end))
+    return windows
+
+def plan_excitement_sampling(peaks, duration, dense_fps=EXCITEMENT_DENSE_FPS, sparse_fps=EXCITEMENT_SPARSE_FPS,
+                             window_before=EXCITEMENT_WINDOW_BEFORE, window_after=EXCITEMENT_WINDOW_AFTER,
+                             group_size=DEFAULT_GROUP_SIZE):
+    """Plan frame timestamps: dense around each peak, sparse everywhere else.
+
+    Each peak window (see excitement_windows) becomes one group, so it
+    yields one best frame; sparse frames in between are grouped by
+    group_size. Returns a time-ordered list of timestamp groups.
+    """
+    windows = excitement_windows(peaks, duration, window_before, window_after)
+
+    groups = []
+    sparse_step = 1.0 / sparse_fps
+    dense_step = 1.0 / dense_fps
+    first_sparse = 0
+    for start, end in windows + [(duration, duration)]:
+        sparse = [step * sparse_step for step in range(first_sparse, math.ceil(start / sparse_step))]
+        groups.extend(sparse[i:i + group_size] for i in range(0, len(sparse), group_size))
+        if end > start:
+            groups.append([start + step * dense_step for step in range(int((end - start) / dense_step) + 1)])
+        # Resume the sparse grid strictly after the dense window
+        first_sparse = math.floor(end / sparse_step) + 1
+
+    return [group for group in groups if group]
+
+def find_video_excitement_peaks(video_path, audio_output, threshold=EXCITEMENT_THRESHOLD):
+    """Extract a video's audio to audio_output and return its excitement peaks.
+
+    Returns None when the video has no audio track that can be extracted.
+    """
+    if not extract_audio(video_path, audio_output):
+        return None
+    samples, sample_rate = load_pcm(audio_output)
+    return detect_excitement_peaks(samples, sample_rate, threshold)
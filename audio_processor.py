@@ -1,26 +1,343 @@
+import os
 import subprocess
-import whisper
-from config import FFMPEG_PATH
+import threading
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+from config import (
+    FFMPEG_PATH, AUDIO_SAMPLE_RATE, VAD_ENABLED, VAD_FRAME_MS,
+    VAD_ENERGY_MARGIN_DB, VAD_MAX_FLATNESS, VAD_MIN_SPEECH_MS, VAD_MIN_SILENCE_MS, VAD_PADDING_MS,
+    TRANSCRIPTION_WORKERS, TRANSCRIPTION_CHUNK_SECONDS, TRANSCRIPTION_OVERLAP_SECONDS,
+    TRANSCRIPTION_BATCH_SECONDS, TRANSCRIPTION_BATCH_GAP_SECONDS
+)
+from utils import format_match_clock
+from transcription_backends import get_transcription_backend, LANGUAGE_DETECTION_SECONDS
+from progress import ProgressReporter
 
-def transcribe_audio(video_path, audio_output, language_code=None):
-    """Extract and transcribe audio from video with optional language specification"""
-    try:
-        ffmpeg_command = [
-            FFMPEG_PATH, "-y", "-i", video_path,
-            "-vn", "-acodec", "pcm_s16le",
-            "-ar", "16000", "-ac", "1", audio_output
-        ]
-
-        result = subprocess.run(ffmpeg_command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        if result.returncode != 0:
-            return "[Error: Could not extract audio]"
-
-        model = whisper.load_model("medium")
-        if language_code:
-            result = model.transcribe(audio_output, language=language_code)
+def extract_audio(video_path, audio_output, start=None, duration=None):
+    """Extract 16 kHz mono PCM audio from video, optionally only a time window"""
+    ffmpeg_command = [FFMPEG_PATH, "-y"]
+    if start is not None:
+        ffmpeg_command += ["-ss", f"{start:.3f}"]
+    ffmpeg_command += ["-i", video_path]
+    if duration is not None:
+        ffmpeg_command += ["-t", f"{duration:.3f}"]
+    ffmpeg_command += [
+        "-vn", "-acodec", "pcm_s16le",
+        "-ar", str(AUDIO_SAMPLE_RATE), "-ac", "1", audio_output
+    ]
+
+    result = subprocess.run(ffmpeg_command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return result.returncode == 0
+
+def load_pcm(audio_path):
+    """Read a 16-bit mono PCM WAV file as float32 samples in [-1, 1]"""
+    import numpy as np
+    with wave.open(audio_path, "rb") as wav_file:
+        sample_rate = wav_file.getframerate()
+        raw = wav_file.readframes(wav_file.getnframes())
+    samples = np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+    return samples, sample_rate
+
+def detect_speech_regions(samples, sample_rate=AUDIO_SAMPLE_RATE, frame_ms=VAD_FRAME_MS,
+                          energy_margin_db=VAD_ENERGY_MARGIN_DB, max_flatness=VAD_MAX_FLATNESS,
+                          min_speech_ms=VAD_MIN_SPEECH_MS, min_silence_ms=VAD_MIN_SILENCE_MS,
+                          padding_ms=VAD_PADDING_MS):
+    """Find speech in PCM audio and return padded, merged (start, end) regions in seconds.
+
+    A frame counts as speech when it is louder than the recording's noise
+    floor by energy_margin_db and its 300-3400 Hz spectrum is harmonic rather
+    than noise-like (low spectral flatness), which rejects silence as well as
+    steady crowd ambience.
+    """
+    import numpy as np
+    frame_length = int(sample_rate * frame_ms / 1000)
+    frame_count = len(samples) // frame_length
+    if frame_count == 0:
+        return []
+
+    window = np.hanning(frame_length).astype(np.float32)
+    freqs = np.fft.rfftfreq(frame_length, 1.0 / sample_rate)
+    speech_band = (freqs >= 300) & (freqs <= 3400)
+
+    energy_db = np.empty(frame_count, dtype=np.float32)
+    flatness = np.empty(frame_count, dtype=np.float32)
+    block = 4096  # frames per FFT batch keeps memory flat on full matches
+    for first in range(0, frame_count, block):
+        last = min(first + block, frame_count)
+        frames = samples[first * frame_length:last * frame_length].reshape(-1, frame_length)
+        energy_db[first:last] = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+        power = np.abs(np.fft.rfft(frames * window, axis=1)[:, speech_band]) ** 2 + 1e-12
+        flatness[first:last] = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+
+    noise_floor = np.percentile(energy_db, 10)
+    is_speech = (energy_db > noise_floor + energy_margin_db) & (flatness < max_flatness)
+
+    # Collapse speech frames into runs, then drop blips, pad and merge close runs
+    edges = np.diff(np.concatenate(([0], is_speech.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    frame_seconds = frame_length / sample_rate
+    total_seconds = len(samples) / sample_rate
+    padding = padding_ms / 1000
+    regions = []
+    for start, end in zip(starts, ends):
+        if (end - start) * frame_seconds < min_speech_ms / 1000:
+            continue
+        region_start = max(0.0, start * frame_seconds - padding)
+        region_end = min(total_seconds, end * frame_seconds + padding)
+        if regions and region_start - regions[-1][1] < min_silence_ms / 1000:
+            regions[-1] = (regions[-1][0], region_end)
         else:
-            result = model.transcribe(audio_output)
+            regions.append((region_start, region_end))
+
+    return regions
+
+def find_quiet_point(samples, sample_rate, start, end, hop_ms=100):
+    """Return the time in seconds of the quietest hop between start and end"""
+    import numpy as np
+    hop = int(sample_rate * hop_ms / 1000)
+    first = int(start * sample_rate)
+    count = (int(end * sample_rate) - first) // hop
+    if count < 1:
+        return end
+
+    frames = samples[first:first + count * hop].reshape(count, hop)
+    quietest = int(np.argmin(np.mean(frames ** 2, axis=1)))
+    return (first + quietest * hop + hop / 2) / sample_rate
+
+def _pack_short_chunks(chunks, batch_seconds, gap_seconds):
+    """Concatenate adjacent short chunks into batches of at most batch_seconds of audio.
+
+    Whisper pads every call to a 30 second window, so transcribing many
+    short speech regions one by one costs more than the whole track.
+    Packed chunks list their "pieces": where each stretch of source audio
+    ("start"-"end") sits in the batch ("offset"), with gap_seconds of
+    silence between stretches.
+    """
+    packed = []
+    for chunk in chunks:
+        length = chunk["audio_end"] - chunk["audio_start"]
+        previous = packed[-1] if packed else None
+        if previous and length < batch_seconds:
+            last_piece = previous["pieces"][-1]
+            offset = last_piece["offset"] + (last_piece["end"] - last_piece["start"]) + gap_seconds
+            if offset + length <= batch_seconds:
+                previous["pieces"].append({"offset": offset, "start": chunk["audio_start"], "end": chunk["audio_end"]})
+                previous["end"] = chunk["end"]
+                previous["audio_end"] = chunk["audio_end"]
+                continue
+        packed.append(dict(chunk, pieces=[{"offset": 0.0, "start": chunk["audio_start"], "end": chunk["audio_end"]}]))
+    return packed
+
+def plan_transcription_chunks(samples, sample_rate, regions, chunk_seconds=TRANSCRIPTION_CHUNK_SECONDS,
+                              overlap_seconds=TRANSCRIPTION_OVERLAP_SECONDS, batch_seconds=TRANSCRIPTION_BATCH_SECONDS,
+                              gap_seconds=TRANSCRIPTION_BATCH_GAP_SECONDS):
+    """Split long speech regions at the quietest nearby point and pack short ones together.
+
+    Each chunk owns the span "start"-"end"; the audio actually transcribed,
+    "audio_start"-"audio_end", reaches overlap_seconds past any cut made in
+    the middle of a region so words on the boundary are heard whole.
+    Adjacent chunks shorter than batch_seconds are then packed into one
+    transcription call (see _pack_short_chunks).
+    """
+    chunks = []
+    for region_start, region_end in regions:
+        cuts = [region_start]
+        while region_end - cuts[-1] > chunk_seconds:
+            chunk_start = cuts[-1]
+            cuts.append(find_quiet_point(
+                samples, sample_rate, chunk_start + chunk_seconds * 0.75, chunk_start + chunk_seconds
+            ))
+        cuts.append(region_end)
+
+        for start, end in zip(cuts, cuts[1:]):
+            chunks.append({
+                "start": start,
+                "end": end,
+                "audio_start": max(region_start, start - overlap_seconds),
+                "audio_end": min(region_end, end + overlap_seconds)
+            })
+
+    return _pack_short_chunks(chunks, batch_seconds, gap_seconds)
+
+def chunk_clip(samples, sample_rate, chunk):
+    """Cut a chunk's audio out of the samples, joining packed pieces with silence"""
+    import numpy as np
+    parts = []
+    for piece in chunk["pieces"]:
+        gap = int(piece["offset"] * sample_rate) - sum(len(part) for part in parts)
+        if gap > 0:
+            parts.append(np.zeros(gap, dtype=samples.dtype))
+        parts.append(samples[int(piece["start"] * sample_rate):int(piece["end"] * sample_rate)])
+    return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+def _to_timeline(chunk, seconds):
+    """Map a time within a chunk's clip back onto the file's own timeline"""
+    for piece in reversed(chunk["pieces"]):
+        if seconds >= piece["offset"]:
+            # Times in the silence after a piece snap to that piece's end
+            return min(piece["start"] + seconds - piece["offset"], piece["end"])
+    return chunk["pieces"][0]["start"]
+
+def _stitch_chunk_segments(chunk, result):
+    """Move chunk segments onto the global timeline and drop overlap duplicates.
 
-        return result["text"].strip()
+    A segment belongs to the chunk its midpoint falls in, so a sentence heard
+    by two neighbouring chunks is kept exactly once.
+    """
+    segments = []
+    for segment in result["segments"]:
+        start = _to_timeline(chunk, segment["start"])
+        end = _to_timeline(chunk, segment["end"])
+        midpoint = (start + end) / 2
+        after_start = chunk["audio_start"] == chunk["start"] or midpoint >= chunk["start"]
+        before_end = chunk["audio_end"] == chunk["end"] or midpoint < chunk["end"]
+        if segment["text"] and after_start and before_end:
+            segments.append({"start": start, "end": end, "text": segment["text"]})
+    return segments
+
+_worker_backend = None
+
+def _init_transcription_worker(cpu_threads):
+    """Load a warm model once per pool process"""
+    global _worker_backend
+    _worker_backend = get_transcription_backend(cpu_threads=cpu_threads)
+    _worker_backend.load()
+
+def _detect_language_in_worker(clip):
+    return _worker_backend.detect_language(clip)
+
+def _transcribe_in_worker(clip, language_code):
+    return _worker_backend.transcribe(clip, language_code)
+
+_transcription_pool = None
+_transcription_pool_size = 0
+_transcription_pool_lock = threading.Lock()
+
+def get_transcription_pool(workers=TRANSCRIPTION_WORKERS, reset=False):
+    """Shared process pool whose workers keep their model loaded between jobs.
+
+    Loading the model dominates short jobs, so the pool lives as long as
+    the server process; it is only rebuilt when its size changes or a
+    worker died (reset=True).
+    """
+    global _transcription_pool, _transcription_pool_size
+    with _transcription_pool_lock:
+        if _transcription_pool is not None and (reset or _transcription_pool_size != workers):
+            _transcription_pool.shutdown(wait=False, cancel_futures=True)
+            _transcription_pool = None
+        if _transcription_pool is None:
+            cpu_threads = max(1, (os.cpu_count() or 1) // workers)
+            _transcription_pool = ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_transcription_worker, initargs=(cpu_threads,)
+            )
+            _transcription_pool_size = workers
+        return _transcription_pool
+
+def _language_sample(clips, sample_rate):
+    """The first LANGUAGE_DETECTION_SECONDS of speech, joined across clips"""
+    import numpy as np
+    needed = LANGUAGE_DETECTION_SECONDS * sample_rate
+    parts = []
+    for clip in clips:
+        parts.append(clip[:needed - sum(len(part) for part in parts)])
+        if sum(len(part) for part in parts) >= needed:
+            break
+    return np.concatenate(parts)
+
+def transcribe_segments(audio_path, language_code=None, use_vad=VAD_ENABLED, workers=TRANSCRIPTION_WORKERS, progress=None):
+    """Transcribe an extracted audio file into timestamped segments.
+
+    With use_vad only detected speech regions are sent to the configured
+    transcription backend. Long regions are split into overlapping chunks
+    and short ones are packed into shared calls; with more than one worker
+    the chunks are transcribed across a long-lived process pool. When
+    language_code is None the language is detected once up front, on the
+    first half minute of speech, and used for every chunk. Returns
+    (segments, stats) where segments are {"start", "end", "text"} dicts on
+    the file's own timeline and stats reports how much audio was skipped.
+    """
+    progress = progress or ProgressReporter()
+    samples, sample_rate = load_pcm(audio_path)
+    total_seconds = len(samples) / sample_rate
+
+    regions = detect_speech_regions(samples, sample_rate) if use_vad else [(0.0, total_seconds)]
+    chunks = plan_transcription_chunks(samples, sample_rate, regions)
+    clips = [chunk_clip(samples, sample_rate, chunk) for chunk in chunks]
+
+    results = []
+    if clips and workers > 1 and len(clips) > 1:
+        # Detecting on a sub-second first region is unreliable, so use the first half minute of speech
+        language_sample = None if language_code else _language_sample(clips, sample_rate)
+        for attempt in range(2):
+            executor = get_transcription_pool(workers, reset=attempt > 0)
+            try:
+                if not language_code:
+                    language_code = executor.submit(_detect_language_in_worker, language_sample).result()
+                results = []
+                for result in executor.map(_transcribe_in_worker, clips, repeat(language_code)):
+                    results.append(result)
+                    progress.update("transcribe", len(results), len(clips))
+                break
+            except BrokenProcessPool:
+                # A worker was killed (e.g. out of memory); retry once on a fresh pool
+                if attempt:
+                    raise
+    elif clips:
+        backend = get_transcription_backend()
+        if not language_code:
+            language_code = backend.detect_language(_language_sample(clips, sample_rate))
+        for clip in clips:
+            results.append(backend.transcribe(clip, language_code))
+            progress.update("transcribe", len(results), len(clips))
+
+    segments = []
+    for chunk, result in zip(chunks, results):
+        segments.extend(_stitch_chunk_segments(chunk, result))
+    segments.sort(key=lambda segment: segment["start"])
+
+    speech_seconds = sum(end - start for start, end in regions)
+    stats = {
+        "total_seconds": total_seconds,
+        "speech_seconds": speech_seconds,
+        "skipped_seconds": max(0.0, total_seconds - speech_seconds),
+        "regions": len(regions),
+        "chunks": len(chunks),
+        "language": language_code
+    }
+    return segments, stats
+
+def format_timestamped_transcript(segments, offset=0.0):
+    """Render transcript segments as one "[MM:SS] text" line each"""
+    return "\n".join(
+        f"[{format_match_clock(offset + segment['start'])}] {segment['text']}"
+        for segment in segments
+    )
+
+def transcribe_audio_file(audio_path, language_code=None):
+    """Transcribe a short, already extracted audio file in this process"""
+    segments, _ = transcribe_segments(audio_path, language_code, workers=1)
+    return " ".join(segment["text"] for segment in segments)
+
+def transcribe_audio_with_stats(video_path, audio_output, language_code=None, use_vad=VAD_ENABLED, progress=None, reuse_audio=False):
+    """Extract and transcribe audio, returning the timestamped transcript and skip statistics.
+
+    With reuse_audio, an audio_output already extracted earlier in the job is
+    transcribed as is.
+    """
+    try:
+        if not (reuse_audio and os.path.exists(audio_output)) and not extract_audio(video_path, audio_output):
+            return "[Error: Could not extract audio]", None
+
+        segments, stats = transcribe_segments(audio_output, language_code, use_vad, progress=progress)
+        return format_timestamped_transcript(segments), stats
     except Exception as e:
-        return f"[Error transcribing audio: {str(e)}]"
+        return f"[Error transcribing audio: {str(e)}]", None
+
+def transcribe_audio(video_path, audio_output, language_code=None):
+    """Extract and transcribe audio from video with optional language specification"""
+    transcript, _ = transcribe_audio_with_stats(video_path, audio_output, language_code)
+    return transcript
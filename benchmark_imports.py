@@ -0,0 +1,65 @@
+"""Profile the import cost of the app's startup path.
+
+Usage:
+    python benchmark_imports.py [--module main] [--max-seconds 2.0] [--top 15]
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter,
+prints the slowest imports, and exits non-zero if startup takes longer
+than --max-seconds or pulls in a module that must stay lazy (whisper,
+torch, cv2, gtts, ...), so a top-level heavy import cannot slip back in.
+"""
+import argparse
+import subprocess
+import sys
+
+# Heavy modules that must only be imported inside the stages that use them
+LAZY_MODULES = ("whisper", "torch", "faster_whisper", "ctranslate2", "cv2", "gtts", "numpy", "pandas")
+
+def profile_imports(module):
+    """Return [(cumulative_us, self_us, name)] for every import made by `import module`"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        # Nested imports are indented by two extra spaces per level
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()[1:]))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the app's import-time startup cost")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--max-seconds", type=float, default=2.0)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    rows = profile_imports(args.module)
+    top_level = [row for row in rows if not row[2].startswith(" ")]
+    total_seconds = sum(cumulative for cumulative, _, _ in top_level) / 1e6
+
+    print(f"{'cumulative ms':>14}{'self ms':>10}  module")
+    for cumulative, self_time, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"{cumulative / 1000:>14.1f}{self_time / 1000:>10.1f}  {name}")
+    print(f"\nTotal import time for '{args.module}': {total_seconds:.2f}s (limit {args.max_seconds:.2f}s)")
+
+    imported = {name.strip().split(".")[0] for _, _, name in rows}
+    eager = [module for module in LAZY_MODULES if module in imported]
+
+    failed = False
+    if eager:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(eager)}")
+        failed = True
+    if total_seconds > args.max_seconds:
+        print("FAIL: startup import time is over the limit")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
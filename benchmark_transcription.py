@@ -0,0 +1,82 @@
+"""Measure transcription speed per backend and model size.
+
+Usage:
+    python benchmark_transcription.py match.mp4 --backends whisper faster-whisper --model-sizes small medium
+
+Reports load time, transcription time and real-time factor (RTF =
+transcription time / audio duration, lower is faster) for each
+combination, all on the same extracted audio.
+"""
+import argparse
+import os
+import time
+from config import TRANSCRIPTION_BACKEND, WHISPER_MODEL_SIZE
+from audio_processor import extract_audio, load_pcm
+from transcription_backends import TRANSCRIPTION_BACKENDS, get_transcription_backend
+
+BENCHMARK_AUDIO_FILE = "benchmark_audio.wav"
+
+def benchmark_backend(samples, sample_rate, backend_name, model_size, language_code=None):
+    """Transcribe the samples once with one backend and return timing results"""
+    backend = get_transcription_backend(backend_name, model_size)
+
+    load_start = time.perf_counter()
+    backend.load()
+    load_seconds = time.perf_counter() - load_start
+
+    transcribe_start = time.perf_counter()
+    result = backend.transcribe(samples, language_code)
+    transcribe_seconds = time.perf_counter() - transcribe_start
+
+    audio_seconds = len(samples) / sample_rate
+    return {
+        "backend": backend_name,
+        "model_size": model_size,
+        "audio_seconds": audio_seconds,
+        "load_seconds": load_seconds,
+        "transcribe_seconds": transcribe_seconds,
+        "rtf": transcribe_seconds / audio_seconds if audio_seconds else 0.0,
+        "segments": len(result["segments"]),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark transcription backends on a video or WAV file")
+    parser.add_argument("media_path", help="Video file, or a 16 kHz mono WAV file")
+    parser.add_argument("--backends", nargs="+", default=[TRANSCRIPTION_BACKEND], choices=list(TRANSCRIPTION_BACKENDS))
+    parser.add_argument("--model-sizes", nargs="+", default=[WHISPER_MODEL_SIZE])
+    parser.add_argument("--language", default=None, help="Spoken language code, auto-detected if omitted")
+    parser.add_argument("--max-seconds", type=float, default=None, help="Only benchmark the first N seconds of audio")
+    args = parser.parse_args()
+
+    if args.media_path.lower().endswith(".wav"):
+        audio_path = args.media_path
+    else:
+        audio_path = BENCHMARK_AUDIO_FILE
+        if not extract_audio(args.media_path, audio_path, duration=args.max_seconds):
+            raise SystemExit("Could not extract audio with ffmpeg")
+
+    try:
+        samples, sample_rate = load_pcm(audio_path)
+    finally:
+        if audio_path == BENCHMARK_AUDIO_FILE and os.path.exists(audio_path):
+            os.remove(audio_path)
+
+    if args.max_seconds:
+        samples = samples[:int(args.max_seconds * sample_rate)]
+
+    print(f"{'backend':<16}{'model':<10}{'audio s':>10}{'load s':>10}{'transcribe s':>14}{'RTF':>8}{'segments':>10}")
+    for backend_name in args.backends:
+        for model_size in args.model_sizes:
+            try:
+                row = benchmark_backend(samples, sample_rate, backend_name, model_size, args.language)
+            except ImportError as e:
+                print(f"{backend_name:<16}{model_size:<10} skipped: {e}")
+                continue
+            print(
+                f"{row['backend']:<16}{row['model_size']:<10}{row['audio_seconds']:>10.1f}"
+                f"{row['load_seconds']:>10.1f}{row['transcribe_seconds']:>14.1f}"
+                f"{row['rtf']:>8.3f}{row['segments']:>10}"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -16,8 +16,111 @@ os.environ["PATH"] += os.pathsep + os.path.dirname(FFMPEG_PATH)
 DEFAULT_FPS = 1
 DEFAULT_GROUP_SIZE = 5
 DEFAULT_FRAME_INTERVAL = 30
+DECODE_WORKERS = os.cpu_count()
+MIN_SHARD_SECONDS = 60
+
+# --- Shot Grouping Configuration ---
+# Group sampled frames by camera shot instead of every DEFAULT_GROUP_SIZE frames
+SHOT_GROUPING_ENABLED = True
+SHOT_CUT_THRESHOLD = 0.5  # color histogram Bhattacharyya distance treated as a cut
+SHOT_MIN_GROUP_SIZE = 2
+SHOT_MAX_GROUP_SIZE = 10
+
+# --- Audio Excitement Sampling Configuration ---
+# Sample frames densely around crowd/commentary peaks and sparsely elsewhere
+EXCITEMENT_SAMPLING_ENABLED = True
+EXCITEMENT_HOP_SECONDS = 0.5
+EXCITEMENT_BASELINE_SECONDS = 60
+EXCITEMENT_THRESHOLD = 2.5  # robust standard deviations above the local baseline; lower finds more peaks
+EXCITEMENT_MIN_GAP_SECONDS = 20
+EXCITEMENT_WINDOW_BEFORE = 8
+EXCITEMENT_WINDOW_AFTER = 4
+EXCITEMENT_DENSE_FPS = 2
+EXCITEMENT_SPARSE_FPS = 0.2
+# Seek instead of decoding through gaps longer than this between sampled frames
+SEEK_GAP_SECONDS = 10
+
+# --- Frame Scoring Configuration ---
+SCORING_WORKERS = 4
+# Frames decoded but not yet scored; decoding pauses when this many are waiting
+SCORING_MAX_IN_FLIGHT = 8
+
+# --- Transcription Configuration ---
+# "whisper" (openai-whisper, fp32) or "faster-whisper" (CTranslate2, quantized)
+TRANSCRIPTION_BACKEND = "whisper"
+WHISPER_MODEL_SIZE = "medium"
+FASTER_WHISPER_COMPUTE_TYPE = "int8"
+TRANSCRIPTION_CPU_THREADS = 0  # 0 lets the backend pick
+# Each worker process holds its own model in memory (about 2-3 GB for "medium" in fp32)
+TRANSCRIPTION_WORKERS = 4
+TRANSCRIPTION_CHUNK_SECONDS = 120
+TRANSCRIPTION_OVERLAP_SECONDS = 3
+# Short speech regions are packed into one call of up to Whisper's 30 s window
+TRANSCRIPTION_BATCH_SECONDS = 30
+TRANSCRIPTION_BATCH_GAP_SECONDS = 0.5
+AUDIO_SAMPLE_RATE = 16000
+
+# --- Voice Activity Detection Configuration ---
+VAD_ENABLED = True
+VAD_FRAME_MS = 30
+VAD_ENERGY_MARGIN_DB = 6
+VAD_MAX_FLATNESS = 0.3
+VAD_MIN_SPEECH_MS = 250
+VAD_MIN_SILENCE_MS = 800
+VAD_PADDING_MS = 300
+
+# --- Live Ingestion Configuration ---
+LIVE_WINDOW_SECONDS = 30
+LIVE_LEADERBOARD_SIZE = 10
+LIVE_POLL_INTERVAL = 5
+LIVE_SEGMENT_EXTENSIONS = (".ts", ".mp4", ".mkv", ".mov", ".avi", ".flv")
+# Frame scoring for a whole live session; it is paced to last LIVE_MATCH_SECONDS of match time
+LIVE_MAX_REQUESTS = 600
+LIVE_MAX_TOKENS = 800000
+LIVE_MATCH_SECONDS = 110 * 60  # two halves, half-time and stoppage
+
+# --- API Budget Configuration ---
+# Shared by every session in the server process
+API_REQUESTS_PER_SECOND = 5
+API_TOKENS_PER_MINUTE = 200000
+# Per upload; frames are sampled more sparsely when a video would exceed this
+JOB_MAX_REQUESTS = 300
+JOB_MAX_TOKENS = 400000
+# The article prompt is capped to these, so its cost does not grow with the match length
+ARTICLE_TRANSCRIPT_MAX_TOKENS = 8000
+ARTICLE_DESCRIPTIONS_MAX_TOKENS = 6000
+# Held back from frame analysis for the article, caption and translations; jobs size
+# the token reserve from their languages with article_generator.estimate_article_reserve
+JOB_RESERVED_REQUESTS = 12
+JOB_RESERVED_TOKENS = ARTICLE_TRANSCRIPT_MAX_TOKENS + ARTICLE_DESCRIPTIONS_MAX_TOKENS + 3000
+IMAGE_TOKEN_ESTIMATE = 800
+
+# --- Multi-language Publishing Configuration ---
+TRANSLATION_WORKERS = 4
+
+# --- Raw Data Ingestion Configuration ---
+RAW_DATA_TOKEN_BUDGET = 2000
+RAW_DATA_MAX_PLAYERS = 30
+
+# --- Progress Reporting Configuration ---
+PROGRESS_MIN_INTERVAL = 0.5  # seconds between progress updates sent to sinks
+PROGRESS_LOG_FILE = None  # e.g. "pipeline_progress.jsonl" to log events for background jobs
+
+# --- Stage Cache Configuration ---
+STAGE_CACHE_FOLDER = ".stage_cache"
+STAGE_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+# --- Startup Configuration ---
+# Preload in a background thread when the server starts, so the first upload does not wait
+WARMUP_ON_START = True
+# Only helps in-process transcription (live mode, single-chunk audio); pool workers load their
+# own, so with a pool this would just hold another copy of the model in the server process
+WARMUP_TRANSCRIPTION_MODEL = TRANSCRIPTION_WORKERS <= 1
+HTTP_POOL_SIZE = 16
 
 # --- File Paths ---
 FRAMES_FOLDER = "frames"
 TEMP_AUDIO_FILE = "temp_audio.wav"
+LIVE_FRAMES_FOLDER = "live_frames"
+LIVE_AUDIO_FILE = "live_audio.wav"
 
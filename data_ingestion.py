@@ -0,0 +1,368 @@
+import csv
+import io
+import json
+import math
+import re
+from collections import Counter, defaultdict
+from config import RAW_DATA_TOKEN_BUDGET, RAW_DATA_MAX_PLAYERS
+
+# Canonical fields and the column/key names they are recognised by
+FIELD_ALIASES = {
+    "minute": ("minute", "min", "time", "clock", "match_time", "timestamp"),
+    "period": ("period", "half", "phase"),
+    "team": ("team", "team_name", "side", "club", "squad"),
+    "player": ("player", "player_name", "scorer", "athlete"),
+    "event": ("event", "event_type", "type", "action"),
+    "outcome": ("outcome", "result", "detail", "details", "description", "qualifier"),
+    "score": ("score", "scoreline"),
+}
+
+# Events that are reported one by one; everything else is only counted
+KEY_EVENT_PATTERN = re.compile(
+    r"\b(goals?|penalty|penalties|cards?|red|yellow|substitutions?|subs?|var|injury|injured|own goal)\b"
+)
+NON_KEY_EVENT_PATTERN = re.compile(r"\bgoal ?kicks?\b")
+
+JSON_READ_SIZE = 64 * 1024
+
+def estimate_tokens(text):
+    """Rough token count for English-like text (about four characters per token)"""
+    return math.ceil(len(text) / 4)
+
+def _flatten(record, prefix=""):
+    """Flatten nested dicts into dotted keys, keeping only scalar values"""
+    flat = {}
+    for key, value in record.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        elif not isinstance(value, list) and value not in (None, ""):
+            flat[name] = value
+    return flat
+
+def _project(record):
+    """Map a flat record onto the canonical fields it contains"""
+    projected = {}
+    for key, value in record.items():
+        parts = key.lower().replace(" ", "_").split(".")
+        for field, aliases in FIELD_ALIASES.items():
+            if field in projected:
+                continue
+            # "player.name" style keys count for their parent field
+            if parts[-1] in aliases or (parts[-1] in ("name", "id") and len(parts) > 1 and parts[-2] in aliases):
+                projected[field] = str(value).strip()
+    return projected
+
+def _minute_value(minute):
+    match = re.match(r"\s*(\d+)", minute or "")
+    return int(match.group(1)) if match else None
+
+def _period_label(projected):
+    if projected.get("period"):
+        return projected["period"]
+    minute = _minute_value(projected.get("minute"))
+    if minute is None:
+        return "unknown period"
+    if minute <= 45:
+        return "1st half"
+    return "2nd half" if minute <= 90 else "extra time"
+
+class _JsonStream:
+    """Incrementally decode JSON from a text stream without reading it all.
+
+    Top-level arrays and arrays directly under a top-level object are
+    yielded element by element; other top-level values are small enough to
+    decode whole and are reported as metadata. JSON Lines files work too.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        chunk = self.stream.read(JSON_READ_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def _peek(self):
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in " \t\r\n,:":
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._fill():
+                return None
+
+    def _decode_value(self):
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(self.buffer) or self.eof or not isinstance(value, (int, float)):
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def _iter_array(self):
+        self.position += 1  # "["
+        while self._peek() not in ("]", None):
+            yield "record", self._decode_value()
+        self.position += 1
+
+    def _is_json_lines(self):
+        """True when the first two lines each hold a complete JSON object.
+
+        A single object followed by a newline is an ordinary JSON document,
+        so only a second object line makes the file JSON Lines.
+        """
+        for _ in range(3):
+            parts = self.buffer[self.position:].split("\n")
+            if not self.eof:
+                parts = parts[:-1]  # the last part may still be incomplete
+            lines = [line for line in parts if line.strip()][:2]
+            if len(lines) == 2 or self.eof:
+                break
+            self._fill()
+
+        if len(lines) < 2:
+            return False
+        try:
+            return all(isinstance(json.loads(line), dict) for line in lines)
+        except json.JSONDecodeError:
+            return False
+
+    def items(self):
+        """Yield ("record", value) for streamed records and ("metadata", value) for the rest"""
+        first = self._peek()
+        if first == "[":
+            yield from self._iter_array()
+            return
+
+        if first == "{" and self._is_json_lines():
+            while self._peek() is not None:
+                yield "record", self._decode_value()
+            return
+
+        if first == "{":
+            # Walk the object key by key so big arrays can be streamed
+            self.position += 1
+            while self._peek() not in ("}", None):
+                key = self._decode_value()
+                if self._peek() == "[":
+                    yield from self._iter_array()
+                else:
+                    yield "metadata", {key: self._decode_value()}
+        elif first is not None:
+            yield "metadata", {"value": self._decode_value()}
+
+class MatchDataCompactor:
+    """Reduce raw match data to a compact text summary under a token budget.
+
+    Records are consumed one at a time: key events (goals, cards,
+    substitutions...) are kept verbatim, everything else is folded into
+    per-team, per-period and per-player counts. Records without any
+    recognisable match field are kept as compact rows with consecutive
+    repeats collapsed, as are lines of plain text files.
+    """
+
+    def __init__(self, token_budget=RAW_DATA_TOKEN_BUDGET, max_players=RAW_DATA_MAX_PLAYERS):
+        self.token_budget = token_budget
+        self.max_players = max_players
+        self.record_count = 0
+        self.metadata = []
+        self.key_events = []
+        self.team_counts = defaultdict(Counter)
+        self.period_counts = defaultdict(Counter)
+        self.player_counts = defaultdict(Counter)
+        self.player_teams = {}
+        self.raw_lines = []
+        self.raw_chars = 0
+        self.raw_omitted = 0
+        self._last_line = None
+        self._repeat_count = 0
+
+    def add_metadata(self, record, prefix=""):
+        for key, value in record.items():
+            name = f"{prefix}{key}"
+            if isinstance(value, dict):
+                self.add_metadata(value, f"{name}.")
+            elif isinstance(value, list):
+                # Event lists nested inside match info are still records
+                for item in value:
+                    self.add_record(item)
+            elif value not in (None, ""):
+                self.metadata.append(f"{name}: {value}")
+
+    def add_record(self, record):
+        if not isinstance(record, dict):
+            self.add_line(str(record))
+            return
+
+        flat = _flatten(record)
+        projected = _project(flat)
+        if "event" not in projected and "player" not in projected:
+            self.add_line(" | ".join(f"{key}={value}" for key, value in flat.items()))
+            return
+
+        self.record_count += 1
+        event = projected.get("event", "involvement").lower()
+        period = _period_label(projected)
+        self.period_counts[period][event] += 1
+        if projected.get("team"):
+            self.team_counts[projected["team"]][event] += 1
+        if projected.get("player"):
+            self.player_counts[projected["player"]][event] += 1
+            if projected.get("team"):
+                self.player_teams[projected["player"]] = projected["team"]
+
+        event_text = f"{event} {projected.get('outcome', '')}".lower().replace("_", " ")
+        if KEY_EVENT_PATTERN.search(event_text) and not NON_KEY_EVENT_PATTERN.search(event_text):
+            self.key_events.append(projected)
+
+    def add_line(self, line):
+        line = " ".join(line.split())
+        if not line:
+            return
+        self.record_count += 1
+        if line == self._last_line:
+            self._repeat_count += 1
+            return
+        self._flush_repeat()
+        self._last_line = line
+
+        # Plain text beyond twice the budget can never be sent, so stop storing it
+        if self.raw_chars > self.token_budget * 8:
+            self.raw_omitted += 1
+            return
+        self.raw_lines.append(line)
+        self.raw_chars += len(line)
+
+    def _flush_repeat(self):
+        if self._repeat_count and self.raw_lines and self.raw_lines[-1] == self._last_line:
+            self.raw_lines[-1] = f"{self._last_line} (x{self._repeat_count + 1})"
+        self._repeat_count = 0
+
+    def render(self):
+        """Return the compact text, trimmed to the token budget"""
+        self._flush_repeat()
+        sections = []
+
+        if self.metadata:
+            sections.append(("MATCH INFO", self.metadata))
+
+        if self.key_events:
+            sections.append(("KEY EVENTS", [self._format_event(event) for event in self.key_events]))
+
+        if self.team_counts:
+            sections.append(("TEAM TOTALS", [
+                f"{team}: {self._format_counts(counts)}" for team, counts in self.team_counts.items()
+            ]))
+
+        if self.period_counts:
+            sections.append(("BY PERIOD", [
+                f"{period}: {sum(counts.values())} events - {self._format_counts(counts)}"
+                for period, counts in self.period_counts.items()
+            ]))
+
+        if self.player_counts:
+            busiest = sorted(self.player_counts.items(), key=lambda item: -sum(item[1].values()))
+            lines = []
+            for player, counts in busiest[:self.max_players]:
+                team = f" ({self.player_teams[player]})" if player in self.player_teams else ""
+                lines.append(f"{player}{team}: {self._format_counts(counts)}")
+            if len(busiest) > self.max_players:
+                lines.append(f"... {len(busiest) - self.max_players} more players with fewer actions")
+            sections.append(("PLAYER STATS", lines))
+
+        if self.raw_lines:
+            lines = list(self.raw_lines)
+            if self.raw_omitted:
+                lines.append(f"... {self.raw_omitted} more lines not read")
+            sections.append(("DATA", lines))
+
+        output = []
+        used = 0
+        omitted = 0
+        for title, lines in sections:
+            header = f"{title}:"
+            if used + estimate_tokens(header) + 1 > self.token_budget:
+                omitted += len(lines)
+                continue
+            output.append(header)
+            used += estimate_tokens(header) + 1
+            for line in lines:
+                cost = estimate_tokens(line) + 1
+                if used + cost > self.token_budget:
+                    omitted += 1
+                    continue
+                output.append(line)
+                used += cost
+            output.append("")
+
+        if omitted:
+            output.append(f"[{omitted} lines omitted to fit the {self.token_budget}-token budget]")
+        return "\n".join(output).strip()
+
+    @staticmethod
+    def _format_counts(counts):
+        return ", ".join(f"{count} {event}" for event, count in counts.most_common())
+
+    @staticmethod
+    def _format_event(event):
+        parts = []
+        if event.get("minute"):
+            parts.append(f"{event['minute']}'")
+        if event.get("period"):
+            parts.append(f"[{event['period']}]")
+        if event.get("team"):
+            parts.append(event["team"])
+        who = f"{event['player']}: " if event.get("player") else ""
+        what = event.get("event", "")
+        if event.get("outcome"):
+            what = f"{what} ({event['outcome']})"
+        if event.get("score"):
+            what = f"{what} - score {event['score']}"
+        parts.append(f"- {who}{what}")
+        return " ".join(parts)
+
+def compact_match_data(file_obj, file_name, token_budget=RAW_DATA_TOKEN_BUDGET):
+    """Stream an uploaded JSON, CSV or TXT file into a compact match summary.
+
+    Returns (text, summary) where summary holds the number of records read
+    and the estimated token count of the text.
+    """
+    # utf-8-sig drops the byte order mark some spreadsheet and JSON exporters write
+    stream = io.TextIOWrapper(file_obj, encoding="utf-8-sig", errors="replace", newline="")
+    compactor = MatchDataCompactor(token_budget)
+    extension = file_name.lower().rsplit(".", 1)[-1]
+
+    if extension == "json":
+        for kind, value in _JsonStream(stream).items():
+            if kind == "record":
+                compactor.add_record(value)
+            else:
+                compactor.add_metadata(value)
+    elif extension == "csv":
+        for row in csv.DictReader(stream):
+            compactor.add_record({key: value for key, value in row.items() if key})
+    else:
+        for line in stream:
+            compactor.add_line(line)
+
+    text = compactor.render()
+    summary = {
+        "records": compactor.record_count,
+        "estimated_tokens": estimate_tokens(text),
+        "token_budget": token_budget,
+    }
+    return text, summary
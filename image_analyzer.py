@@ -1,15 +1,17 @@
 import base64
-import requests
-import json
-import streamlit as st
-from config import DEPLOYMENT_URL, HEADERS
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from config import SCORING_WORKERS, SCORING_MAX_IN_FLIGHT
+from api_client import ApiError, post_chat_completion
+from api_budget import BudgetExceeded, estimate_payload_tokens
+from progress import ProgressReporter
+from utils import format_match_clock
 
-def describe_image_with_scoring(image_path, timestamp):
-    """Describe image and provide importance score"""
-    with open(image_path, "rb") as f:
-        img_base64 = base64.b64encode(f.read()).decode("utf-8")
-    
-    payload = {
+# Bump when the scoring prompt or response parsing changes so cached scores are not reused
+SCORING_PROMPT_VERSION = 1
+
+def _scoring_payload(img_base64):
+    """Build the chat payload that describes and scores one frame"""
+    return {
         "messages": [
             {
                 "role": "user",
@@ -43,11 +45,39 @@ def describe_image_with_scoring(image_path, timestamp):
             }
         ],
         "max_tokens": 300 }
+
+def _frame_token_estimate():
+    """Estimated tokens of one frame analysis; images count the same whatever their size"""
+    return estimate_payload_tokens(_scoring_payload(""))
+
+def frames_beyond_reserve(budget):
+    """How many more frames can be scored without touching the job's reserve"""
+    return max(0, min(
+        budget.remaining_requests - budget.reserved_requests,
+        (budget.remaining_tokens - budget.reserved_tokens) // _frame_token_estimate()
+    ))
+
+def can_score_frame(budget):
+    """Whether one more frame can be scored without touching the job's reserve"""
+    return budget is None or frames_beyond_reserve(budget) >= 1
+
+def describe_image_with_scoring(image_path, timestamp, budget=None, progress=None, prepaid=False):
+    """Describe image and provide importance score.
+
+    With prepaid the frame was already charged to budget when it was queued
+    (see StreamingFrameScorer).
+    """
+    with open(image_path, "rb") as f:
+        img_base64 = base64.b64encode(f.read()).decode("utf-8")
+    
+    payload = _scoring_payload(img_base64)
+    error_reason = "API Error"
+    error = None
     
     try:
-        response = requests.post(DEPLOYMENT_URL, headers=HEADERS, data=json.dumps(payload))
-        if response.status_code == 200:
-            content = response.json()['choices'][0]['message']['content'].strip()
+        content, _ = post_chat_completion(payload, budget, "frame analysis", prepaid)
+        if content:
+            content = content.strip()
             
             # Parse the response
             lines = content.split('\n')
@@ -73,45 +103,211 @@ def describe_image_with_scoring(image_path, timestamp):
                 "timestamp": timestamp,
                 "image_path": image_path
             }
+    except BudgetExceeded:
+        error_reason = "Job budget exhausted"
+    except ApiError:
+        pass
     except Exception as e:
-        st.error(f"Error analyzing image: {str(e)}")
+        error = f"Error analyzing image: {str(e)}"
+        (progress or ProgressReporter()).message("error", error, "score")
     
     return {
         "description": "[Error analyzing image]",
         "score": 1,
-        "reason": "API Error",
+        "reason": error_reason,
+        # Unexpected failures, for callers that report them on their own thread
+        "error": error,
         "timestamp": timestamp,
         "image_path": image_path
     }
 
-def find_best_frames_per_group(frame_groups):
-    """Find the best frame from each group"""
-    best_frames = []
-    all_frame_data = []
-    
-    progress_bar = st.progress(0)
-    total_groups = len(frame_groups)
-    
-    for group_idx, group in enumerate(frame_groups):
-        group_data = []
-        
-        # Analyze each frame in the group
-        for frame_idx, frame_path in enumerate(group):
-            timestamp = group_idx * 5 + frame_idx  # Approximate timestamp
-            frame_data = describe_image_with_scoring(frame_path, timestamp)
-            group_data.append(frame_data)
-            all_frame_data.append(frame_data)
-        
-        # Find best frame in this group
-        best_frame_in_group = max(group_data, key=lambda x: x['score'])
-        best_frames.append(best_frame_in_group)
-        
-        # Update progress
-        progress = (group_idx + 1) / total_groups
-        progress_bar.progress(progress)
-    
-    progress_bar.empty()
-    return best_frames, all_frame_data
+def _spread(items, count):
+    """Pick `count` evenly spaced items, keeping their order"""
+    if count >= len(items):
+        return list(items)
+    return [items[int((i + 0.5) * len(items) / count)] for i in range(count)]
+
+def in_peak_window(seconds, peak_windows):
+    return any(start <= seconds <= end for start, end in peak_windows)
+
+class FrameBudgetPlan:
+    """Decides how many frames of each incoming group to score when the budget cannot cover them all.
+
+    Groups that start inside one of peak_windows (see
+    audio_excitement.excitement_windows) are paid for first: all peak_frames
+    are scored when they fit in affordable, otherwise every peak group gets
+    the same share of its frames and nothing else is scored. What is left
+    is paced over the other groups by video time, each second of footage
+    earning the same share, so it covers the whole video however many
+    groups it turns out to have. Unspent share carries over to later groups.
+    """
+
+    def __init__(self, affordable, duration, peak_windows=(), peak_frames=0):
+        self.peak_windows = list(peak_windows)
+        peak_budget = min(affordable, peak_frames)
+        self.peak_share = peak_budget / peak_frames if peak_frames else 0.0
+        self.sparse_rate = (affordable - peak_budget) / duration if duration else 0.0
+        self.peak_earned = 0.0
+        self.peak_used = 0
+        self.sparse_used = 0
+
+    def is_peak(self, group):
+        return in_peak_window(group[0][1], self.peak_windows)
+
+    def allowance(self, group):
+        """Number of the group's frames to score; call once per group, in video order"""
+        if self.is_peak(group):
+            self.peak_earned += len(group) * self.peak_share
+            count = min(len(group), int(self.peak_earned + 1e-9) - self.peak_used)
+            self.peak_used += count
+        else:
+            count = max(0, min(len(group), int(self.sparse_rate * group[-1][1] + 0.5) - self.sparse_used))
+            self.sparse_used += count
+        return count
+
+    def thin(self, group):
+        """The group's frames to score, evenly spaced"""
+        return _spread(group, self.allowance(group))
+
+class StreamingFrameScorer:
+    """Scores frame groups while they are still being decoded.
+
+    run() pulls groups from any iterable, typically a generator that decodes
+    the video, and hands their frames to a pool of scoring threads. At most
+    max_in_flight frames wait for a score at once; beyond that the
+    generator is not advanced, so decoding pauses until scoring catches up
+    and memory stays bounded. Results are collected on the calling thread,
+    which keeps the running group winners and calls on_best(frame_data)
+    each time the provisional best frame changes, so callers can show it
+    (and Streamlit can be used from it) long before the video is done.
+    known_scores maps timestamps to frame results from an earlier run of
+    the same video; those frames are reused without a model call.
+    """
+
+    def __init__(self, budget=None, progress=None, workers=SCORING_WORKERS,
+                 max_in_flight=SCORING_MAX_IN_FLIGHT, on_best=None, known_scores=None):
+        self.budget = budget
+        self.known_scores = known_scores or {}
+        self.progress = progress or ProgressReporter()
+        self.workers = workers
+        self.max_in_flight = max(1, max_in_flight)
+        self.on_best = on_best
+        self.frame_groups = []
+        self.group_results = []
+        self.pending = []
+        self.best_by_group = {}
+        self.provisional_best = None
+        self.in_flight = {}
+        self.scored = 0
+        self.expected_scored = 0
+        # False when scoring stopped before the end of the video
+        self.complete = True
+
+    def run(self, frame_groups, expected_duration=None, expected_frames=None, peak_windows=(), peak_frames=0):
+        """Score every group and return (best_frames, all_frame_data) in video order.
+
+        When the budget cannot cover expected_frames, a FrameBudgetPlan
+        thins the groups: peak_frames, the planned frames inside
+        peak_windows, are scored first and the rest of the budget is spread
+        over the remaining footage by video time.
+        """
+        plan = None
+        self.expected_scored = expected_frames or 0
+        if self.budget and expected_frames and expected_duration:
+            affordable = frames_beyond_reserve(self.budget)
+            if affordable < expected_frames:
+                plan = FrameBudgetPlan(affordable, expected_duration, peak_windows, peak_frames)
+                self.expected_scored = affordable
+                if not peak_frames:
+                    kept = "spread evenly over the video"
+                elif affordable >= peak_frames:
+                    kept = "every frame around the excitement peaks and the rest spread evenly over the video"
+                else:
+                    kept = "an even share of each excitement peak and none in between"
+                self.budget.record_degradation(
+                    f"Scored about {affordable} of {expected_frames} frames to stay within the job budget: {kept}"
+                )
+
+        frame_tokens = _frame_token_estimate()
+        self.progress.start_stage("score")
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for group in frame_groups:
+                group_index = len(self.frame_groups)
+                self.frame_groups.append(group)
+                planned = group
+                if plan is not None:
+                    planned = plan.thin(group)
+                fresh = [index for index, (_, timestamp) in enumerate(planned) if timestamp not in self.known_scores]
+                if self.budget and fresh:
+                    # Hard floor: frame scoring never eats into the article's reserve. Frames
+                    # are charged as they are queued, so in-flight frames are already counted
+                    room = frames_beyond_reserve(self.budget)
+                    if room == 0:
+                        self.budget.record_degradation(
+                            f"Stopped frame analysis at {format_match_clock(planned[fresh[0]][1])} to keep the job budget's reserve for the article"
+                        )
+                        self.frame_groups.pop()
+                        self.complete = False
+                        break
+                    kept = set(_spread(fresh, room))
+                    planned = [
+                        frame for index, frame in enumerate(planned)
+                        if index in kept or frame[1] in self.known_scores
+                    ]
+                self.group_results.append([None] * len(planned))
+                self.pending.append(len(planned))
+
+                for frame_index, (frame_path, timestamp) in enumerate(planned):
+                    if timestamp in self.known_scores:
+                        self._record(group_index, frame_index, dict(self.known_scores[timestamp], image_path=frame_path))
+                        continue
+                    while len(self.in_flight) >= self.max_in_flight:
+                        self._collect(wait(self.in_flight, return_when=FIRST_COMPLETED).done)
+                    if self.budget:
+                        self.budget.reserve(frame_tokens, "frame analysis")
+                    future = executor.submit(
+                        describe_image_with_scoring, frame_path, timestamp, self.budget, prepaid=True
+                    )
+                    self.in_flight[future] = (group_index, frame_index)
+
+                # Pick up anything finished while this group was decoding
+                self._collect([future for future in self.in_flight if future.done()])
+
+            if not self.complete and hasattr(frame_groups, "close"):
+                # Stop the decoder too; nothing more will be scored
+                frame_groups.close()
+
+            while self.in_flight:
+                self._collect(wait(self.in_flight, return_when=FIRST_COMPLETED).done)
+
+        self.progress.finish_stage("score")
+        best_frames = [self.best_by_group[index] for index in sorted(self.best_by_group)]
+        all_frame_data = [frame_data for results in self.group_results for frame_data in results]
+        return best_frames, all_frame_data
+
+    def _collect(self, done_futures):
+        for future in done_futures:
+            group_index, frame_index = self.in_flight.pop(future)
+            frame_data = future.result()
+            if frame_data.get('error'):
+                # Worker threads cannot reach Streamlit, so errors are shown from here
+                self.progress.message("error", frame_data['error'], "score")
+            self._record(group_index, frame_index, frame_data)
+
+    def _record(self, group_index, frame_index, frame_data):
+        self.group_results[group_index][frame_index] = frame_data
+        self.scored += 1
+        self.pending[group_index] -= 1
+        self.progress.update("score", self.scored, max(self.expected_scored, self.scored + len(self.in_flight)))
+        if self.pending[group_index] > 0:
+            return
+
+        winner = max(self.group_results[group_index], key=lambda x: x['score'])
+        self.best_by_group[group_index] = winner
+        if self.provisional_best is None or winner['score'] > self.provisional_best['score']:
+            self.provisional_best = winner
+            if self.on_best:
+                self.on_best(winner)
 
 def find_global_best_frame(best_frames):
     """Find the overall best frame from all group winners"""
@@ -0,0 +1,223 @@
+import heapq
+import os
+import shutil
+import time
+from config import (
+    DEFAULT_FPS, LIVE_WINDOW_SECONDS, LIVE_LEADERBOARD_SIZE, LIVE_POLL_INTERVAL,
+    LIVE_SEGMENT_EXTENSIONS, LIVE_FRAMES_FOLDER, LIVE_AUDIO_FILE, LIVE_MATCH_SECONDS
+)
+from audio_processor import extract_audio, transcribe_audio_file
+from image_analyzer import describe_image_with_scoring, can_score_frame, frames_beyond_reserve, FrameBudgetPlan
+from article_generator import generate_article
+from utils import cleanup_files, format_match_clock
+from video_processor import get_video_duration, read_frames_between
+
+def list_live_sources(source):
+    """List the media files behind a live source, oldest first.
+
+    A directory is treated as a set of rolling segments ordered by file name
+    (e.g. segment_0001.ts, segment_0002.ts); anything else is a single
+    recording that may still be growing.
+    """
+    if os.path.isdir(source):
+        return [
+            os.path.join(source, name)
+            for name in sorted(os.listdir(source))
+            if name.lower().endswith(LIVE_SEGMENT_EXTENSIONS)
+        ]
+    return [source] if os.path.exists(source) else []
+
+class LiveMatchSession:
+    """Incrementally process an in-progress match recording window by window.
+
+    Each call to poll() scores and transcribes only the windows that became
+    available since the previous call, keeps a leaderboard of the best key
+    moments, and keeps the running transcript so that a match report can be
+    produced at any time without going back over earlier footage. An
+    optional JobBudget caps frame scoring for the whole session; when it
+    cannot cover every frame of match_seconds, frames are thinned evenly by
+    match time so the budget lasts the match. Reports are charged to the
+    budget given to build_report, so each one can be afforded.
+    """
+
+    def __init__(self, source, language_code=None, window_seconds=LIVE_WINDOW_SECONDS,
+                 fps=DEFAULT_FPS, leaderboard_size=LIVE_LEADERBOARD_SIZE,
+                 output_folder=LIVE_FRAMES_FOLDER, budget=None, match_seconds=LIVE_MATCH_SECONDS):
+        self.source = source
+        self.budget = budget
+        self.budget_plan = None
+        if budget:
+            affordable = frames_beyond_reserve(budget)
+            if affordable < match_seconds * fps:
+                self.budget_plan = FrameBudgetPlan(affordable, match_seconds)
+                budget.record_degradation(
+                    f"Scoring about one frame every {match_seconds / max(affordable, 1):.0f}s of match time "
+                    f"so the budget lasts {format_match_clock(match_seconds)}"
+                )
+        self.language_code = language_code
+        self.window_seconds = window_seconds
+        self.fps = fps
+        self.leaderboard_size = leaderboard_size
+        self.output_folder = output_folder
+
+        self.windows = []
+        self.transcript_parts = []
+        self.segment_offsets = {}
+        self.segment_positions = {}
+        self.finished_segments = set()
+        self._next_offset = 0.0
+        self._leaderboard = []
+        self._counter = 0
+        self._budget_stopped = False
+
+        if os.path.exists(output_folder):
+            shutil.rmtree(output_folder)
+        os.makedirs(output_folder, exist_ok=True)
+
+    @property
+    def processed_seconds(self):
+        """Match time covered by the windows processed so far"""
+        return max((window["end"] for window in self.windows), default=0.0)
+
+    @property
+    def leaderboard(self):
+        """Key moments so far, best first"""
+        return [entry[3] for entry in sorted(self._leaderboard, reverse=True)]
+
+    def poll(self, final=False):
+        """Process every complete window that is available right now.
+
+        The newest file is assumed to still be recording, so its trailing
+        partial window is left for a later poll unless final is True.
+        """
+        new_windows = []
+        sources = list_live_sources(self.source)
+
+        for index, path in enumerate(sources):
+            if path in self.finished_segments:
+                continue
+            if path not in self.segment_offsets:
+                self.segment_offsets[path] = self._next_offset
+                self.segment_positions[path] = 0.0
+
+            settled = final or index < len(sources) - 1
+            new_windows.extend(self._process_segment(path, settled))
+
+            if settled:
+                self.finished_segments.add(path)
+                duration = get_video_duration(path) or self.segment_positions[path]
+                self._next_offset = self.segment_offsets[path] + duration
+
+        return new_windows
+
+    def run(self, poll_interval=LIVE_POLL_INTERVAL, idle_timeout=None, on_window=None):
+        """Keep polling until no new footage arrives for idle_timeout seconds"""
+        last_activity = time.time()
+        while True:
+            windows = self.poll()
+            for window in windows:
+                if on_window:
+                    on_window(window)
+            if windows:
+                last_activity = time.time()
+            elif idle_timeout is not None and time.time() - last_activity >= idle_timeout:
+                break
+            time.sleep(poll_interval)
+
+        for window in self.poll(final=True):
+            if on_window:
+                on_window(window)
+
+    def build_report(self, output_language="English", budget=None):
+        """Write a match report from everything processed so far, charged to budget"""
+        moments = self.leaderboard
+        if not moments:
+            return None
+
+        chronological = [
+            dict(moment, description=f"[{format_match_clock(moment['timestamp'])}] {moment['description']}")
+            for moment in sorted(moments, key=lambda x: x['timestamp'])
+        ]
+        best_moment = dict(moments[0], description=f"[{format_match_clock(moments[0]['timestamp'])}] {moments[0]['description']}")
+        transcript = "\n".join(self.transcript_parts) or "[No commentary transcribed yet]"
+
+        return generate_article(transcript, chronological, best_moment, output_language, budget)
+
+    def _process_segment(self, path, settled):
+        windows = []
+        while True:
+            start = self.segment_positions[path]
+            window = self._process_window(path, start, start + self.window_seconds, settled)
+            if window is None:
+                break
+            windows.append(window)
+            self.segment_positions[path] = start + self.window_seconds
+            if window["partial"]:
+                break
+        return windows
+
+    def _process_window(self, path, start, end, settled):
+        offset = self.segment_offsets[path]
+        prefix = f"window{len(self.windows)}"
+        frames, complete = read_frames_between(path, start, end, self.fps, self.output_folder, prefix)
+
+        if not complete and (not settled or not frames):
+            cleanup_files(*[frame_path for frame_path, _ in frames])
+            return None
+
+        match_frames = [(frame_path, offset + position) for frame_path, position in frames]
+        chosen = set(self.budget_plan.thin(match_frames) if self.budget_plan and match_frames else match_frames)
+        window_frames = []
+        for frame_path, timestamp in match_frames:
+            if (frame_path, timestamp) not in chosen:
+                cleanup_files(frame_path)
+                continue
+            # Past the expected match length the budget can run out
+            if not can_score_frame(self.budget):
+                if not self._budget_stopped:
+                    self.budget.record_degradation(
+                        f"Stopped scoring live frames at {format_match_clock(timestamp)} to stay within the job budget"
+                    )
+                    self._budget_stopped = True
+                cleanup_files(frame_path)
+                continue
+            frame_data = describe_image_with_scoring(frame_path, timestamp, self.budget)
+            window_frames.append(frame_data)
+        best_frame = max(window_frames, key=lambda x: x['score'], default=None)
+
+        transcript = ""
+        try:
+            if extract_audio(path, LIVE_AUDIO_FILE, start=start, duration=end - start):
+                transcript = transcribe_audio_file(LIVE_AUDIO_FILE, self.language_code)
+        except Exception as e:
+            transcript = f"[Error transcribing audio: {str(e)}]"
+        finally:
+            cleanup_files(LIVE_AUDIO_FILE)
+
+        if transcript:
+            self.transcript_parts.append(f"[{format_match_clock(offset + start)}] {transcript}")
+
+        for frame_data in window_frames:
+            self._add_to_leaderboard(frame_data)
+
+        if not complete:
+            end = min(end, frames[-1][1] + 1.0 / self.fps)
+
+        window = {
+            "index": len(self.windows),
+            "start": offset + start,
+            "end": offset + end,
+            "partial": not complete,
+            "best_frame": best_frame,
+            "transcript": transcript,
+        }
+        self.windows.append(window)
+        return window
+
+    def _add_to_leaderboard(self, frame_data):
+        self._counter += 1
+        entry = (frame_data['score'], -frame_data['timestamp'], self._counter, frame_data)
+        heapq.heappush(self._leaderboard, entry)
+        if len(self._leaderboard) > self.leaderboard_size:
+            dropped = heapq.heappop(self._leaderboard)
+            cleanup_files(dropped[3]['image_path'])
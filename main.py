@@ -3,7 +3,6 @@ import base64
 import os
 import time
 from tempfile import NamedTemporaryFile
-from gtts import gTTS
 
 # Assuming these imports are correctly configured and available
 # You might need to install these if you haven't:
@@ -12,16 +11,39 @@ from gtts import gTTS
 # pip install torch torchvision torchaudio  # If using local ML models for image analysis
 # pip install transformers  # If using Hugging Face models for image analysis/captioning
 
-from config import FRAMES_FOLDER, TEMP_AUDIO_FILE
-from utils import image_to_base64, cleanup_files, cleanup_folder
-from video_processor import extract_frame_groups
-from audio_processor import transcribe_audio
-from image_analyzer import find_best_frames_per_group, find_global_best_frame
-from article_generator import generate_article, generate_article_from_text, generate_short_caption, edit_article_with_prompt
+from config import (
+    FRAMES_FOLDER, TEMP_AUDIO_FILE, PROGRESS_LOG_FILE, DEPLOYMENT_URL,
+    TRANSCRIPTION_BACKEND, WHISPER_MODEL_SIZE, VAD_ENABLED, WARMUP_ON_START, JOB_RESERVED_REQUESTS,
+    LIVE_MAX_REQUESTS, LIVE_MAX_TOKENS,
+    EXCITEMENT_SAMPLING_ENABLED, EXCITEMENT_THRESHOLD, EXCITEMENT_DENSE_FPS, EXCITEMENT_SPARSE_FPS,
+    EXCITEMENT_WINDOW_BEFORE, EXCITEMENT_WINDOW_AFTER,
+    SHOT_GROUPING_ENABLED, SHOT_CUT_THRESHOLD, SHOT_MIN_GROUP_SIZE, SHOT_MAX_GROUP_SIZE
+)
+from utils import image_to_base64, cleanup_files, cleanup_folder, format_match_clock
+from video_processor import iter_frame_groups, iter_frames_at_timestamps, get_video_duration
+from audio_processor import transcribe_audio_with_stats
+from audio_excitement import find_video_excitement_peaks, plan_excitement_sampling, excitement_windows
+from image_analyzer import StreamingFrameScorer, find_global_best_frame, in_peak_window, SCORING_PROMPT_VERSION
+from article_generator import generate_article, generate_article_from_text, generate_short_caption, edit_article_with_prompt, generate_multilingual_articles, estimate_article_reserve
+from live_processor import LiveMatchSession
+from data_ingestion import compact_match_data
+from api_budget import JobBudget
+from progress import ProgressReporter, StreamlitProgressSink, JsonLogProgressSink
+from stage_cache import StageCache, hash_file
+from warmup import start_background_warmup
 
 # Default settings for spoken and article language
 DEFAULT_SPOKEN_LANGUAGE_CODE = "en"
 DEFAULT_ARTICLE_LANGUAGE = "English"
+ARTICLE_LANGUAGES = ["English", "Nepali", "Spanish", "Hindi", "French", "French (Canada)"]
+
+# Video pipeline stages as name -> (label, share of total work) for the progress bar
+VIDEO_PIPELINE_STAGES = {
+    "extract": ("🎞️ Extracting frames", 0.15),
+    "score": ("🔍 Analyzing frames", 0.45),
+    "transcribe": ("🎧 Transcribing audio", 0.3),
+    "article": ("📰 Writing article", 0.1),
+}
 
 def initialize_session_state():
     """Initialize session state variables"""
@@ -37,6 +59,12 @@ def initialize_session_state():
     # Store the original article to enable the "Reset to Original" functionality
     if 'original_article' not in st.session_state:
         st.session_state.original_article = None
+    # Live match session survives reruns so each poll only processes new footage
+    if 'live_session' not in st.session_state:
+        st.session_state.live_session = None
+    # Localized versions of the last video article, keyed by language
+    if 'translations' not in st.session_state:
+        st.session_state.translations = None
 
 def setup_page_config():
     """Setup Streamlit page configuration"""
@@ -46,7 +74,7 @@ def setup_page_config():
 
 def create_input_tabs():
     """Create input tabs for video upload and raw data input"""
-    tab1, tab2 = st.tabs(["📹 Video Upload", "📝 Raw Data Input"])
+    tab1, tab2, tab3 = st.tabs(["📹 Video Upload", "📝 Raw Data Input", "🔴 Live Match"])
 
     video_file = None
     raw_match_data = None
@@ -76,11 +104,29 @@ def create_input_tabs():
         # Update session state directly when this selectbox changes
         st.session_state.article_language = st.selectbox(
             "📰 Generate article in:",
-            ["English", "Nepali", "Spanish", "Hindi", "French", "French (Canada)"],
+            ARTICLE_LANGUAGES,
             key="article_lang_select_tab1", # Unique key for this selectbox
-            index=["English", "Nepali", "Spanish", "Hindi", "French", "French (Canada)"].index(st.session_state.article_language)
+            index=ARTICLE_LANGUAGES.index(st.session_state.article_language)
+        )
+
+        st.multiselect(
+            "🌍 Also publish in:",
+            [language for language in ARTICLE_LANGUAGES if language != st.session_state.article_language],
+            key="publish_languages"
         )
 
+        with st.expander("🔊 Excitement-focused frame sampling"):
+            st.checkbox(
+                "Sample frames densely around crowd and commentary peaks",
+                value=EXCITEMENT_SAMPLING_ENABLED,
+                key="excitement_sampling"
+            )
+            st.slider(
+                "Peak sensitivity (lower finds more moments)",
+                min_value=1.0, max_value=5.0, value=float(EXCITEMENT_THRESHOLD), step=0.25,
+                key="excitement_threshold"
+            )
+
     with tab2:
         st.markdown("Enter raw match data manually, or upload structured JSON/timestamp files.")
 
@@ -98,13 +144,16 @@ def create_input_tabs():
         # Update session state directly when this selectbox changes
         st.session_state.article_language = st.selectbox(
             "📰 Generate article in:",
-            ["English", "Nepali", "Spanish", "Hindi", "French", "French (Canada)"],
+            ARTICLE_LANGUAGES,
             key="article_lang_select_tab2", # Unique key for this selectbox
-            index=["English", "Nepali", "Spanish", "Hindi", "French", "French (Canada)"].index(st.session_state.article_language)
+            index=ARTICLE_LANGUAGES.index(st.session_state.article_language)
         )
 
         generate_from_text_button_pressed = st.button("📝 Generate Article from Text Data")
 
+    with tab3:
+        display_live_match_panel()
+
     return (
         video_file,
         raw_match_data,
@@ -113,6 +162,78 @@ def create_input_tabs():
         spoken_language_code_selection
     )
 
+def display_live_match_panel():
+    """Controls for following an in-progress match recording"""
+    st.markdown("Follow a match while it is being recorded. Point to a growing recording file or a folder of rolling segments, then process new footage as it arrives.")
+
+    live_source = st.text_input("📂 Recording file or segment folder", key="live_source")
+    live_language_code = st.selectbox(
+        "🎙️ Spoken language in the recording:",
+        [
+            ("Auto-detect", None),
+            ("English", "en"),
+            ("Nepali", "ne"),
+            ("Spanish", "es"),
+            ("Hindi", "hi"),
+            ("French", "fr"),
+            ("French (Canada)", "fr")
+        ],
+        format_func=lambda x: x[0],
+        key="spoken_lang_select_live"
+    )[1]
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        start_pressed = st.button("▶️ Start Session")
+    with col2:
+        poll_pressed = st.button("🔄 Process New Footage")
+    with col3:
+        finish_pressed = st.button("🏁 Final Whistle")
+    with col4:
+        report_pressed = st.button("📰 Running Report")
+
+    if start_pressed:
+        if not live_source.strip() or not os.path.exists(live_source.strip()):
+            st.warning("Please enter an existing recording file or segment folder.")
+        else:
+            # Covers frame scoring only; every running report gets a budget of its own below
+            budget = JobBudget(LIVE_MAX_REQUESTS, LIVE_MAX_TOKENS, reserved_requests=0, reserved_tokens=0)
+            st.session_state.live_session = LiveMatchSession(live_source.strip(), live_language_code, budget=budget)
+            st.success("Live session started.")
+
+    session = st.session_state.live_session
+
+    if (poll_pressed or finish_pressed or report_pressed) and session is None:
+        st.warning("Please start a live session first.")
+        return
+
+    if poll_pressed or finish_pressed:
+        with st.spinner("🔄 Processing new footage..."):
+            windows = session.poll(final=finish_pressed)
+        st.success(f"Processed {len(windows)} new window(s).")
+
+    if report_pressed:
+        report_requests, report_tokens = estimate_article_reserve()
+        report_budget = JobBudget(report_requests, report_tokens, reserved_requests=0, reserved_tokens=0)
+        with st.spinner("📰 Writing running report..."):
+            article = session.build_report(st.session_state.article_language, report_budget)
+        if article is None:
+            st.warning("No key moments have been processed yet.")
+        elif article != "[Error generating article]":
+            st.session_state.generated_article = article
+            st.session_state.original_article = article
+            best_moment = session.leaderboard[0]
+            st.session_state.article_image_base64 = image_to_base64(best_moment['image_path'])
+            st.session_state.article_caption = generate_short_caption(best_moment['description'], st.session_state.article_language, report_budget)
+            st.session_state.translations = None
+
+    if session:
+        st.markdown(f"**Processed:** {format_match_clock(session.processed_seconds)} of match time in {len(session.windows)} window(s)")
+        for rank, moment in enumerate(session.leaderboard, start=1):
+            st.markdown(f"{rank}. `{format_match_clock(moment['timestamp'])}` — {moment['description']} (Score: {moment['score']}/10)")
+        if session.budget:
+            report_budget_usage(session.budget)
+
 # 🌐 Map UI language to gTTS language code
 def get_gtts_lang_code(article_language):
     language_map = {
@@ -128,6 +249,7 @@ def get_gtts_lang_code(article_language):
 # 🔊 Text-to-Speech Function
 def speak_article(article_text, lang='en'):
     try:
+        from gtts import gTTS
         tts = gTTS(text=article_text, lang=lang)
         audio_path = "article_audio.mp3"
         tts.save(audio_path)
@@ -153,6 +275,22 @@ def display_article_with_editor():
 
         st.write(st.session_state.generated_article)
 
+        if st.session_state.translations:
+            with st.expander("🌍 Other languages"):
+                st.table([
+                    {
+                        "Language": language,
+                        "Tokens": result['tokens'],
+                        "Latency (s)": f"{result['latency']:.1f}",
+                        "Status": result['error'] or "OK"
+                    }
+                    for language, result in st.session_state.translations.items()
+                ])
+                for language, result in list(st.session_state.translations.items())[1:]:
+                    st.markdown(f"#### {language}")
+                    st.caption(result['caption'])
+                    st.write(result['article'])
+
         st.markdown("---")
         st.subheader("✏️ Edit Article")
         st.markdown("Want to modify the article? Enter your editing instructions below:")
@@ -262,21 +400,175 @@ def display_article_with_editor():
                 else:
                     st.error("Failed to generate audio.")
 
+def report_budget_usage(budget):
+    """Show how much of the job's API budget was used and what was cut to fit it"""
+    st.caption(
+        f"💳 Used {budget.requests_used}/{budget.max_requests} model requests and "
+        f"about {budget.tokens_used}/{budget.max_tokens} tokens."
+    )
+    for reason in budget.degradations:
+        st.warning(f"⚖️ {reason}")
+
+def create_progress_reporter(stages):
+    """Progress reporter that drives the page's progress bar and, if configured, a JSON event log"""
+    sinks = [StreamlitProgressSink()]
+    if PROGRESS_LOG_FILE:
+        sinks.append(JsonLogProgressSink(PROGRESS_LOG_FILE))
+    return ProgressReporter(stages, sinks)
+
+def stream_frame_groups(video_path, use_excitement, threshold, progress):
+    """Start decoding frames for scoring.
+
+    Returns (frame_groups, sampling, peaks), where frame_groups is a
+    generator that yields each group as soon as it is decoded and sampling
+    holds what StreamingFrameScorer.run needs to plan the budget up front.
+    With excitement sampling, frames are dense around audio peaks and
+    sparse elsewhere; peaks is None when it was not used or the audio could
+    not be read, in which case frames are sampled uniformly at 1 fps.
+    """
+    duration = get_video_duration(video_path)
+    if use_excitement:
+        peaks = find_video_excitement_peaks(video_path, TEMP_AUDIO_FILE, threshold)
+        if peaks is not None and duration > 0:
+            timestamp_groups = plan_excitement_sampling(peaks, duration)
+            windows = excitement_windows(peaks, duration)
+            sampling = {
+                "expected_duration": duration,
+                "expected_frames": sum(len(group) for group in timestamp_groups),
+                "peak_windows": windows,
+                "peak_frames": sum(len(group) for group in timestamp_groups if in_peak_window(group[0], windows)),
+            }
+            return iter_frames_at_timestamps(video_path, FRAMES_FOLDER, timestamp_groups, progress), sampling, peaks
+        st.caption("🔊 Could not read the audio track; sampling frames uniformly instead.")
+
+    sampling = {"expected_duration": duration, "expected_frames": int(duration)}
+    return iter_frame_groups(video_path, FRAMES_FOLDER, fps=1, group_size=5, progress=progress), sampling, None
+
+def describe_cached_frames(frame_groups, peaks):
+    """Budget planning inputs for frame groups reloaded from the stage cache"""
+    duration = max((group[-1][1] for group in frame_groups), default=0.0)
+    windows = excitement_windows(peaks, duration) if peaks else []
+    return {
+        "expected_duration": duration,
+        "expected_frames": sum(len(group) for group in frame_groups),
+        "peak_windows": windows,
+        "peak_frames": sum(len(group) for group in frame_groups if in_peak_window(group[0][1], windows)),
+    }
+
+def show_provisional_best(placeholder, frame_data):
+    """Show the best frame scored so far while the rest of the video is analyzed"""
+    placeholder.image(
+        frame_data['image_path'],
+        caption=f"⏱️ Best moment so far: {format_match_clock(frame_data['timestamp'])} · score {frame_data['score']}/10"
+    )
+
+def report_excitement_peaks(peaks):
+    """List the detected excitement peaks with their match clock times"""
+    if not peaks:
+        st.caption("🔊 No clear excitement peaks in the audio; frames were sampled sparsely across the whole video.")
+        return
+    with st.expander(f"🔊 {len(peaks)} excitement peak(s) detected in the audio"):
+        for peak in peaks:
+            st.write(f"**{format_match_clock(peak['time'])}** · strength {peak['score']:.1f}")
+
 def process_video_upload(video_file, spoken_language_code):
     with NamedTemporaryFile(delete=False, suffix=".mp4") as temp_video:
         temp_video.write(video_file.read())
         video_path = temp_video.name
 
-    try:
-        st.info("🎞️ Extracting frames...")
-        frame_groups = extract_frame_groups(video_path, FRAMES_FOLDER, fps=1, group_size=5)
+    publish_languages = [st.session_state.article_language] + [
+        language for language in st.session_state.get('publish_languages', [])
+        if language != st.session_state.article_language
+    ]
+    reserved_requests, reserved_tokens = estimate_article_reserve(len(publish_languages))
+    budget = JobBudget(reserved_requests=max(JOB_RESERVED_REQUESTS, reserved_requests), reserved_tokens=reserved_tokens)
+    progress = create_progress_reporter(VIDEO_PIPELINE_STAGES)
 
-        if not frame_groups:
-            st.error("No frames could be extracted from the video.")
-            return
+    try:
+        # Completed stages for the same clip and settings are reused from the stage cache
+        cache = StageCache()
+        video_hash = hash_file(video_path)
+        use_excitement = st.session_state.get('excitement_sampling', EXCITEMENT_SAMPLING_ENABLED)
+        excitement_threshold = st.session_state.get('excitement_threshold', EXCITEMENT_THRESHOLD)
+        if use_excitement:
+            frame_params = {
+                "sampling": "excitement",
+                "threshold": excitement_threshold,
+                "dense_fps": EXCITEMENT_DENSE_FPS,
+                "sparse_fps": EXCITEMENT_SPARSE_FPS,
+                "window": [EXCITEMENT_WINDOW_BEFORE, EXCITEMENT_WINDOW_AFTER],
+                "group_size": 5
+            }
+        else:
+            frame_params = {"fps": 1, "group_size": 5}
+        # Uniform sampling (also the fallback when the audio cannot be read) groups frames by shot
+        if SHOT_GROUPING_ENABLED:
+            frame_params["shots"] = [SHOT_CUT_THRESHOLD, SHOT_MIN_GROUP_SIZE, SHOT_MAX_GROUP_SIZE]
+
+        audio_extracted = False
+        peaks = cache.load(video_hash, "peaks", frame_params) if use_excitement else None
+        score_params = dict(frame_params, prompt_version=SCORING_PROMPT_VERSION, model=DEPLOYMENT_URL)
+        # Scores are kept per frame so a rerun only pays for missing or failed frames;
+        # "result" is stored once a run has scored every frame it planned
+        cached_scores = cache.load(video_hash, "frame_scores", score_params) or {"frames": [], "result": None}
+        if cached_scores["result"] is None:
+            frame_groups = cache.load(video_hash, "frames", frame_params)
+            frames_streamed = frame_groups is None
+            if frames_streamed:
+                # Frames are scored while the rest of the video is still being decoded
+                frame_groups, sampling, peaks = stream_frame_groups(
+                    video_path, use_excitement, excitement_threshold, progress
+                )
+                audio_extracted = peaks is not None
+                if audio_extracted:
+                    cache.save(video_hash, "peaks", frame_params, peaks)
+            else:
+                progress.finish_stage("extract")
+                st.caption("♻️ Reusing extracted frames from a previous run.")
+                sampling = describe_cached_frames(frame_groups, peaks)
+
+            provisional_best = st.empty()
+            known_scores = {frame_data['timestamp']: frame_data for frame_data in cached_scores["frames"]}
+            scorer = StreamingFrameScorer(
+                budget, progress, on_best=lambda frame_data: show_provisional_best(provisional_best, frame_data),
+                known_scores=known_scores
+            )
+            best_frames, all_frame_data = scorer.run(frame_groups, **sampling)
+            provisional_best.empty()
+
+            if not scorer.frame_groups:
+                st.error("No frames could be extracted from the video.")
+                return
+            # Frames are only cached when the whole video was decoded
+            if frames_streamed and scorer.complete:
+                cache.save(
+                    video_hash, "frames", frame_params, scorer.frame_groups,
+                    files=[frame_path for group in scorer.frame_groups for frame_path, _ in group]
+                )
+            scored = dict(known_scores)
+            failed = False
+            for frame_data in all_frame_data:
+                if frame_data['description'] == "[Error analyzing image]":
+                    failed = True
+                else:
+                    scored[frame_data['timestamp']] = frame_data
+            # A budget-thinned run is reused as is: the same budget would thin it the same way
+            finished = scorer.complete and not failed
+            saved = cache.save(
+                video_hash, "frame_scores", score_params,
+                {"frames": list(scored.values()), "result": [best_frames, all_frame_data] if finished else None},
+                files=[frame_data['image_path'] for frame_data in list(scored.values()) + all_frame_data]
+            )
+            if finished:
+                best_frames, all_frame_data = saved["result"]
+        else:
+            best_frames, all_frame_data = cached_scores["result"]
+            progress.finish_stage("extract")
+            progress.finish_stage("score")
+            st.caption("♻️ Reusing frame analysis from a previous run.")
 
-        st.info("🔍 Analyzing frames...")
-        best_frames, all_frame_data = find_best_frames_per_group(frame_groups)
+        if use_excitement and peaks is not None:
+            report_excitement_peaks(peaks)
 
         if not best_frames:
             st.error("Could not analyze any frames.")
@@ -284,26 +576,58 @@ def process_video_upload(video_file, spoken_language_code):
 
         global_best_frame = find_global_best_frame(best_frames)
 
-        st.info("🎧 Transcribing audio...")
-        transcript = transcribe_audio(video_path, TEMP_AUDIO_FILE, spoken_language_code)
+        transcript_params = {
+            "backend": TRANSCRIPTION_BACKEND,
+            "model_size": WHISPER_MODEL_SIZE,
+            "language": spoken_language_code,
+            "vad": VAD_ENABLED
+        }
+        cached_transcript = cache.load(video_hash, "transcript", transcript_params)
+        if cached_transcript is None:
+            progress.start_stage("transcribe")
+            transcript, audio_stats = transcribe_audio_with_stats(
+                video_path, TEMP_AUDIO_FILE, spoken_language_code, progress=progress, reuse_audio=audio_extracted
+            )
+            if audio_stats:
+                cache.save(video_hash, "transcript", transcript_params, [transcript, audio_stats])
+        else:
+            transcript, audio_stats = cached_transcript
+            st.caption("♻️ Reusing the transcript from a previous run.")
+        progress.finish_stage("transcribe")
+        if audio_stats and audio_stats['total_seconds'] > 0:
+            skipped_share = audio_stats['skipped_seconds'] / audio_stats['total_seconds']
+            st.caption(f"🔇 Skipped {audio_stats['skipped_seconds']:.0f}s of non-speech audio ({skipped_share:.0%}) across {audio_stats['regions']} speech region(s).")
+
+        progress.start_stage("article")
+        if len(publish_languages) > 1:
+            translations = generate_multilingual_articles(transcript, all_frame_data, global_best_frame, publish_languages, budget=budget)
+            article = translations[st.session_state.article_language]['article']
+            caption = translations[st.session_state.article_language]['caption']
+        else:
+            translations = None
+            article = generate_article(transcript, all_frame_data, global_best_frame, st.session_state.article_language, budget)
+            caption = generate_short_caption(global_best_frame['description'], st.session_state.article_language, budget) if global_best_frame else None
 
-        article = generate_article(transcript, all_frame_data, global_best_frame, st.session_state.article_language)
+        progress.finish_stage("article")
 
         st.session_state.generated_article = article
         st.session_state.original_article = article # Store the original for reset
+        st.session_state.translations = translations
 
         if global_best_frame:
             image_base64 = image_to_base64(global_best_frame['image_path'])
             st.session_state.article_image_base64 = image_base64
-            st.session_state.article_caption = generate_short_caption(global_best_frame['description'], st.session_state.article_language)
+            st.session_state.article_caption = caption
 
         cleanup_files(TEMP_AUDIO_FILE)
+        report_budget_usage(budget)
         st.success("🎉 Article generated successfully!")
 
     except Exception as e:
         st.error(f"An error occurred: {str(e)}")
 
     finally:
+        progress.close()
         cleanup_files(video_path)
         cleanup_folder(FRAMES_FOLDER)
 
@@ -315,11 +639,12 @@ def process_text_input(raw_match_data):
     st.info("📝 Generating article...")
 
     try:
-        article = generate_article_from_text(raw_match_data, st.session_state.article_language)
+        article = generate_article_from_text(raw_match_data, st.session_state.article_language, JobBudget())
         st.session_state.generated_article = article
         st.session_state.original_article = article # Store the original for reset
         st.session_state.article_image_base64 = None
         st.session_state.article_caption = None
+        st.session_state.translations = None
         st.success("🎉 Article generated successfully!")
 
     except Exception as e:
@@ -331,16 +656,11 @@ def process_uploaded_file(uploaded_data_file):
         return
 
     try:
-        if uploaded_data_file.type == "application/json":
-            import json
-            file_content = json.load(uploaded_data_file)
-            raw_match_data = json.dumps(file_content, indent=2)
-        elif uploaded_data_file.type == "text/csv":
-            import pandas as pd
-            df = pd.read_csv(uploaded_data_file)
-            raw_match_data = df.to_string()
-        else:
-            raw_match_data = uploaded_data_file.read().decode('utf-8')
+        raw_match_data, summary = compact_match_data(uploaded_data_file, uploaded_data_file.name)
+        st.info(
+            f"📦 Compacted {summary['records']} records to about {summary['estimated_tokens']} tokens "
+            f"(budget {summary['token_budget']})."
+        )
 
         process_text_input(raw_match_data)
 
@@ -348,6 +668,8 @@ def process_uploaded_file(uploaded_data_file):
         st.error(f"Error processing uploaded file: {str(e)}")
 
 def main():
+    if WARMUP_ON_START:
+        start_background_warmup()
     initialize_session_state()
     setup_page_config()
 
@@ -0,0 +1,149 @@
+import json
+import logging
+import sys
+import threading
+import time
+from config import PROGRESS_MIN_INTERVAL
+
+logger = logging.getLogger(__name__)
+LOG_LEVELS = {"info": logging.INFO, "warning": logging.WARNING, "error": logging.ERROR}
+
+def format_eta(seconds):
+    """Format a remaining-time estimate as e.g. 1m 05s"""
+    if seconds is None:
+        return "--"
+    minutes, secs = divmod(int(seconds), 60)
+    return f"{minutes}m {secs:02d}s" if minutes else f"{secs}s"
+
+class ProgressReporter:
+    """Collects progress from pipeline stages and forwards it to sinks.
+
+    Stages publish with start_stage/update/finish_stage and message; the
+    reporter weights each stage into one overall fraction with an ETA,
+    throttles progress updates to at most one per min_interval seconds, and
+    hands every event (a plain dict) to each sink's handle() method. With no
+    sinks progress is dropped and messages go to the logging module, so
+    stage code can always publish.
+    """
+
+    def __init__(self, stages=None, sinks=None, min_interval=PROGRESS_MIN_INTERVAL):
+        # stages maps name -> (label, weight), in pipeline order
+        self.stages = dict(stages or {})
+        self.sinks = list(sinks or [])
+        self.min_interval = min_interval
+        self.fractions = {name: 0.0 for name in self.stages}
+        self.started = time.monotonic()
+        self.last_published = 0.0
+        self.lock = threading.Lock()
+
+    def start_stage(self, name):
+        self._ensure_stage(name)
+        self._publish({"type": "stage_start", "stage": name}, force=True)
+
+    def update(self, name, done, total):
+        """Report `done` of `total` units of work for a stage"""
+        self._ensure_stage(name)
+        fraction = min(done / total, 1.0) if total else 0.0
+        with self.lock:
+            self.fractions[name] = fraction
+        self._publish({"type": "progress", "stage": name, "done": done, "total": total, "fraction": fraction})
+
+    def finish_stage(self, name):
+        self._ensure_stage(name)
+        with self.lock:
+            self.fractions[name] = 1.0
+        self._publish({"type": "stage_end", "stage": name, "fraction": 1.0}, force=True)
+
+    def message(self, level, text, stage=None):
+        """Publish a user-facing message ("info", "warning" or "error")"""
+        self._publish({"type": "message", "stage": stage, "level": level, "message": text}, force=True)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+    def overall(self):
+        """Return (overall fraction, ETA in seconds or None)"""
+        with self.lock:
+            total_weight = sum(weight for _, weight in self.stages.values()) or 1.0
+            fraction = sum(self.fractions[name] * weight for name, (_, weight) in self.stages.items()) / total_weight
+        elapsed = time.monotonic() - self.started
+        eta = elapsed * (1 - fraction) / fraction if fraction > 0 else None
+        return fraction, eta
+
+    def _ensure_stage(self, name):
+        with self.lock:
+            if name not in self.stages:
+                self.stages[name] = (name, 1.0)
+                self.fractions[name] = 0.0
+
+    def _publish(self, event, force=False):
+        if not self.sinks:
+            if event["type"] == "message":
+                logger.log(LOG_LEVELS.get(event["level"], logging.INFO), event["message"])
+            return
+        now = time.monotonic()
+        with self.lock:
+            if not force and now - self.last_published < self.min_interval:
+                return
+            self.last_published = now
+
+        overall, eta = self.overall()
+        event.update({
+            "time": time.time(),
+            "label": self.stages.get(event.get("stage"), (event.get("stage"), 0))[0],
+            "overall": overall,
+            "eta": eta
+        })
+        for sink in self.sinks:
+            sink.handle(event)
+
+class StreamlitProgressSink:
+    """Shows overall progress as one Streamlit progress bar with stage and ETA"""
+
+    def __init__(self):
+        import streamlit as st
+        self.st = st
+        self.bar = st.progress(0)
+        self.status = st.empty()
+
+    def handle(self, event):
+        if event["type"] == "message":
+            getattr(self.st, event["level"], self.st.info)(event["message"])
+            return
+        self.bar.progress(min(event["overall"], 1.0))
+        self.status.caption(f"{event['label']} · {event['overall']:.0%} · ETA {format_eta(event['eta'])}")
+
+    def close(self):
+        self.bar.empty()
+        self.status.empty()
+
+class CliProgressSink:
+    """Writes a single updating progress line to a terminal"""
+
+    def __init__(self, stream=sys.stderr):
+        self.stream = stream
+
+    def handle(self, event):
+        if event["type"] == "message":
+            self.stream.write(f"\n[{event['level']}] {event['message']}\n")
+        else:
+            self.stream.write(f"\r{event['label']:<30} {event['overall']:6.1%}  ETA {format_eta(event['eta']):>8}")
+        self.stream.flush()
+
+    def close(self):
+        self.stream.write("\n")
+        self.stream.flush()
+
+class JsonLogProgressSink:
+    """Appends every event as one JSON line, for background jobs"""
+
+    def __init__(self, path):
+        self.file = open(path, "a", encoding="utf-8")
+
+    def handle(self, event):
+        self.file.write(json.dumps(event) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from config import STAGE_CACHE_FOLDER, STAGE_CACHE_MAX_BYTES
+
+CACHED_FILE_PREFIX = "@cache/"
+VALUE_FILE = "value.json"
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """SHA-256 of a file's content, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _replace_strings(value, mapping):
+    """Return a copy of a JSON-like value with strings swapped through mapping"""
+    if isinstance(value, str):
+        return mapping(value)
+    if isinstance(value, dict):
+        return {key: _replace_strings(item, mapping) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_replace_strings(item, mapping) for item in value]
+    return value
+
+def _directory_size(path):
+    return sum(
+        os.path.getsize(os.path.join(folder, name))
+        for folder, _, names in os.walk(path)
+        for name in names
+    )
+
+class StageCache:
+    """Disk store for intermediate pipeline results.
+
+    Entries are keyed by the input video's content hash, the stage name and
+    the parameters that affect the stage's output, so a rerun with the same
+    clip and settings can resume after the last completed stage. Files a
+    result refers to (such as frame images) are stored inside the entry and
+    the result's paths are rewritten to point at them. The least recently
+    used entries are evicted once the cache grows past max_bytes.
+    """
+
+    def __init__(self, root=STAGE_CACHE_FOLDER, max_bytes=STAGE_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def _entry_path(self, content_hash, stage, params):
+        key = json.dumps({"content": content_hash, "stage": stage, "params": params}, sort_keys=True, default=str)
+        return os.path.join(self.root, f"{stage}-{hashlib.sha256(key.encode()).hexdigest()[:32]}")
+
+    def load(self, content_hash, stage, params):
+        """Return the cached result for a stage, or None if there is none"""
+        entry = self._entry_path(content_hash, stage, params)
+        value_path = os.path.join(entry, VALUE_FILE)
+        try:
+            with open(value_path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        # Mark as recently used for eviction
+        os.utime(value_path)
+        return _replace_strings(
+            value,
+            lambda text: os.path.join(entry, text[len(CACHED_FILE_PREFIX):]) if text.startswith(CACHED_FILE_PREFIX) else text
+        )
+
+    def save(self, content_hash, stage, params, value, files=()):
+        """Store a stage result and return it with file paths pointing into the cache"""
+        entry = self._entry_path(content_hash, stage, params)
+        staging = tempfile.mkdtemp(prefix=".staging-", dir=self.root)
+
+        stored_names = {}
+        for index, path in enumerate(dict.fromkeys(files)):
+            name = f"{index}{os.path.splitext(path)[1]}"
+            try:
+                # Hard links avoid a second copy of frames shared between stages
+                os.link(path, os.path.join(staging, name))
+            except OSError:
+                shutil.copy2(path, os.path.join(staging, name))
+            stored_names[path] = name
+
+        stored_value = _replace_strings(
+            value, lambda text: CACHED_FILE_PREFIX + stored_names[text] if text in stored_names else text
+        )
+        with open(os.path.join(staging, VALUE_FILE), "w", encoding="utf-8") as f:
+            json.dump(stored_value, f)
+
+        if os.path.exists(entry):
+            shutil.rmtree(entry, ignore_errors=True)
+        try:
+            os.replace(staging, entry)
+        except OSError:
+            # Another session stored the same entry first
+            shutil.rmtree(staging, ignore_errors=True)
+
+        self.evict()
+        return self.load(content_hash, stage, params) or value
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits max_bytes"""
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            value_path = os.path.join(path, VALUE_FILE)
+            if os.path.isdir(path) and os.path.exists(value_path):
+                entries.append((os.path.getmtime(value_path), _directory_size(path), path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
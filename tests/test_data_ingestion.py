@@ -0,0 +1,73 @@
+import io
+import json
+
+import data_ingestion
+from data_ingestion import _JsonStream, compact_match_data
+
+EVENTS = [
+    {"minute": 12, "team": "A", "player": "Ram", "event": "goal"},
+    {"minute": 30, "team": "B", "player": "Shyam", "event": "pass"},
+    {"minute": 55, "team": "B", "player": "Hari", "event": "yellow card"},
+]
+
+def compact(text, file_name, encoding="utf-8"):
+    return compact_match_data(io.BytesIO(text.encode(encoding)), file_name)
+
+def stream_items(text):
+    return list(_JsonStream(io.StringIO(text)).items())
+
+def test_single_line_object_is_not_json_lines():
+    text, summary = compact(json.dumps({"match": "A vs B", "events": EVENTS}) + "\n", "match.json")
+    assert summary["records"] == 3
+    assert "match: A vs B" in text
+    assert "Ram: goal" in text
+    assert "Hari: yellow card" in text
+
+def test_json_lines():
+    text, summary = compact("".join(json.dumps(event) + "\n" for event in EVENTS), "events.jsonl.json")
+    assert summary["records"] == 3
+    assert "Ram: goal" in text
+
+def test_top_level_array():
+    text, summary = compact(json.dumps(EVENTS), "events.json")
+    assert summary["records"] == 3
+    assert "TEAM TOTALS:" in text
+
+def test_json_with_byte_order_mark():
+    text, summary = compact(json.dumps({"match": "A vs B", "events": EVENTS}), "match.json", "utf-8-sig")
+    assert summary["records"] == 3
+    assert "match: A vs B" in text
+
+def test_csv_with_byte_order_mark_keeps_minute_column():
+    rows = "minute,team,player,event\n12,A,Ram,goal\n55,B,Hari,yellow card\n"
+    text, summary = compact(rows, "events.csv", "utf-8-sig")
+    assert summary["records"] == 2
+    assert "12' A - Ram: goal" in text
+
+def test_array_split_across_chunks(monkeypatch):
+    monkeypatch.setattr(data_ingestion, "JSON_READ_SIZE", 7)
+    records = [dict(event, id=index) for index, event in enumerate(EVENTS * 10)]
+    assert stream_items(json.dumps(records)) == [("record", record) for record in records]
+
+def test_numbers_at_chunk_edges(monkeypatch):
+    # Every chunk boundary falls inside or right after a number
+    monkeypatch.setattr(data_ingestion, "JSON_READ_SIZE", 3)
+    numbers = [12345, 6.75, -890, 1e3, 42]
+    assert stream_items(json.dumps(numbers)) == [("record", number) for number in numbers]
+    assert stream_items('{"minute": 12345}') == [("metadata", {"minute": 12345})]
+
+def test_arrays_under_top_level_object_are_streamed(monkeypatch):
+    monkeypatch.setattr(data_ingestion, "JSON_READ_SIZE", 5)
+    items = stream_items(json.dumps({"match": "A vs B", "events": EVENTS, "attendance": 18000}))
+    assert items == (
+        [("metadata", {"match": "A vs B"})]
+        + [("record", event) for event in EVENTS]
+        + [("metadata", {"attendance": 18000})]
+    )
+
+def test_nested_event_lists():
+    data = {"match": {"home": "A", "away": "B", "timeline": {"events": EVENTS}}}
+    text, summary = compact(json.dumps(data), "match.json")
+    assert summary["records"] == 3
+    assert "match.home: A" in text
+    assert "Ram: goal" in text
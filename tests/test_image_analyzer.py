@@ -0,0 +1,73 @@
+import image_analyzer
+from api_budget import JobBudget
+from audio_excitement import excitement_windows, plan_excitement_sampling
+from image_analyzer import FrameBudgetPlan, StreamingFrameScorer, frames_beyond_reserve, in_peak_window
+
+MATCH_SECONDS = 90 * 60
+
+def match_plan(peak_count):
+    """Excitement sampling plan for a full match with evenly spaced peaks"""
+    peaks = [{"time": (index + 0.5) * MATCH_SECONDS / peak_count, "score": 3.0} for index in range(peak_count)]
+    windows = excitement_windows(peaks, MATCH_SECONDS)
+    groups = [
+        [(f"frame_{seconds:.1f}.jpg", seconds) for seconds in group]
+        for group in plan_excitement_sampling(peaks, MATCH_SECONDS)
+    ]
+    peak_frames = sum(len(group) for group in groups if in_peak_window(group[0][1], windows))
+    return groups, windows, peak_frames
+
+def allowances(plan, groups):
+    return [plan.allowance(group) for group in groups]
+
+def test_plan_scores_every_peak_frame_when_they_fit():
+    groups, windows, peak_frames = match_plan(5)
+    plan = FrameBudgetPlan(200, MATCH_SECONDS, windows, peak_frames)
+    counts = allowances(plan, groups)
+
+    peak_counts = [count for group, count in zip(groups, counts) if plan.is_peak(group)]
+    assert peak_counts == [len(group) for group in groups if plan.is_peak(group)]
+    assert sum(counts) == 200
+
+    # The rest is spread over the whole match rather than its start
+    sparse_times = [group[-1][1] for group, count in zip(groups, counts) if count and not plan.is_peak(group)]
+    assert sparse_times[0] < 10 * 60
+    assert sparse_times[-1] > 80 * 60
+
+def test_plan_shares_budget_between_peaks_when_they_do_not_fit():
+    groups, windows, peak_frames = match_plan(15)
+    plan = FrameBudgetPlan(288, MATCH_SECONDS, windows, peak_frames)
+    counts = allowances(plan, groups)
+
+    assert peak_frames > 288
+    assert all(count > 0 for group, count in zip(groups, counts) if plan.is_peak(group))
+    assert all(count == 0 for group, count in zip(groups, counts) if not plan.is_peak(group))
+    assert 288 - 1 <= sum(counts) <= 288
+
+def test_plan_without_peaks_paces_by_video_time():
+    groups = [[(f"frame_{second}.jpg", float(second)) for second in range(start, start + size)]
+              for start, size in zip(range(0, 3000, 10), [2, 10] * 150)]
+    plan = FrameBudgetPlan(50, 3000, [])
+    counts = allowances(plan, groups)
+
+    assert sum(counts) == 50
+    # Each half of the video gets about half of the frames
+    assert abs(sum(counts[:150]) - 25) <= 1
+
+def test_scorer_scores_every_peak_within_budget(monkeypatch):
+    def score_frame(image_path, timestamp, budget=None, progress=None, prepaid=False):
+        return {"description": "play", "score": 5, "reason": "", "timestamp": timestamp, "image_path": image_path}
+
+    monkeypatch.setattr(image_analyzer, "describe_image_with_scoring", score_frame)
+    groups, windows, peak_frames = match_plan(15)
+    budget = JobBudget()
+    affordable = frames_beyond_reserve(budget)
+
+    scorer = StreamingFrameScorer(budget)
+    _, all_frame_data = scorer.run(
+        iter(groups), MATCH_SECONDS, sum(len(group) for group in groups), windows, peak_frames
+    )
+
+    assert scorer.complete
+    assert affordable - 1 <= len(all_frame_data) <= affordable
+    assert all(any(start <= frame["timestamp"] <= end for frame in all_frame_data) for start, end in windows)
+    assert budget.remaining_requests >= budget.reserved_requests
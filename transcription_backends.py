@@ -0,0 +1,131 @@
+import threading
+from config import (
+    TRANSCRIPTION_BACKEND, WHISPER_MODEL_SIZE, FASTER_WHISPER_COMPUTE_TYPE, TRANSCRIPTION_CPU_THREADS,
+    AUDIO_SAMPLE_RATE
+)
+
+LANGUAGE_DETECTION_SECONDS = 30
+
+class TranscriptionBackend:
+    """Common interface for speech-to-text engines.
+
+    transcribe() takes 16 kHz mono float32 samples and returns
+    {"language": code, "segments": [{"start", "end", "text"}, ...]} with
+    times in seconds relative to the start of the samples.
+    """
+
+    name = None
+
+    def __init__(self, model_size=WHISPER_MODEL_SIZE, cpu_threads=TRANSCRIPTION_CPU_THREADS):
+        self.model_size = model_size
+        self.cpu_threads = cpu_threads
+        self.model = None
+        self._load_lock = threading.Lock()
+
+    def load(self):
+        """Load the model if it is not loaded yet and return it"""
+        # The background warm-up may be loading the same model concurrently
+        with self._load_lock:
+            if self.model is None:
+                self.model = self._load_model()
+        return self.model
+
+    def transcribe(self, samples, language_code=None):
+        raise NotImplementedError
+
+    def detect_language(self, samples):
+        """Detect the spoken language from the first seconds of the samples"""
+        clip = samples[:LANGUAGE_DETECTION_SECONDS * AUDIO_SAMPLE_RATE]
+        return self.transcribe(clip)["language"]
+
+    def _load_model(self):
+        raise NotImplementedError
+
+class WhisperBackend(TranscriptionBackend):
+    """Reference openai-whisper implementation (PyTorch, fp32 on CPU)"""
+
+    name = "whisper"
+
+    def _load_model(self):
+        import whisper
+        if self.cpu_threads:
+            import torch
+            torch.set_num_threads(self.cpu_threads)
+        return whisper.load_model(self.model_size)
+
+    def detect_language(self, samples):
+        import whisper
+        model = self.load()
+        audio = whisper.pad_or_trim(samples)
+        mel = whisper.log_mel_spectrogram(audio, n_mels=model.dims.n_mels).to(model.device)
+        _, probs = model.detect_language(mel)
+        return max(probs, key=probs.get)
+
+    def transcribe(self, samples, language_code=None):
+        model = self.load()
+        if language_code:
+            result = model.transcribe(samples, language=language_code)
+        else:
+            result = model.transcribe(samples)
+
+        return {
+            "language": result.get("language", language_code),
+            "segments": [
+                {"start": segment["start"], "end": segment["end"], "text": segment["text"].strip()}
+                for segment in result["segments"]
+            ]
+        }
+
+class FasterWhisperBackend(TranscriptionBackend):
+    """CTranslate2 Whisper with quantized weights, much faster on CPU-only hosts"""
+
+    name = "faster-whisper"
+
+    def __init__(self, model_size=WHISPER_MODEL_SIZE, cpu_threads=TRANSCRIPTION_CPU_THREADS,
+                 compute_type=FASTER_WHISPER_COMPUTE_TYPE):
+        super().__init__(model_size, cpu_threads)
+        self.compute_type = compute_type
+
+    def _load_model(self):
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError:
+            raise ImportError("The faster-whisper backend needs the faster-whisper package (pip install faster-whisper)")
+        return WhisperModel(self.model_size, device="cpu", compute_type=self.compute_type, cpu_threads=self.cpu_threads)
+
+    def transcribe(self, samples, language_code=None):
+        model = self.load()
+        segments, info = model.transcribe(samples, language=language_code)
+
+        # faster-whisper decodes lazily, so consuming the generator does the work
+        return {
+            "language": info.language,
+            "segments": [
+                {"start": segment.start, "end": segment.end, "text": segment.text.strip()}
+                for segment in segments
+            ]
+        }
+
+    def detect_language(self, samples):
+        model = self.load()
+        # Language detection runs eagerly; the segment generator is never consumed
+        _, info = model.transcribe(samples[:LANGUAGE_DETECTION_SECONDS * AUDIO_SAMPLE_RATE])
+        return info.language
+
+TRANSCRIPTION_BACKENDS = {
+    WhisperBackend.name: WhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+}
+
+_loaded_backends = {}
+
+def get_transcription_backend(name=TRANSCRIPTION_BACKEND, model_size=WHISPER_MODEL_SIZE,
+                              cpu_threads=TRANSCRIPTION_CPU_THREADS):
+    """Return a cached backend instance for the given engine, model size and thread count"""
+    if name not in TRANSCRIPTION_BACKENDS:
+        raise ValueError(f"Unknown transcription backend '{name}'. Choose one of: {', '.join(TRANSCRIPTION_BACKENDS)}")
+
+    key = (name, model_size, cpu_threads)
+    if key not in _loaded_backends:
+        _loaded_backends[key] = TRANSCRIPTION_BACKENDS[name](model_size, cpu_threads)
+    return _loaded_backends[key]
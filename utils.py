@@ -21,4 +21,9 @@ def cleanup_folder(folder_path):
     """Clean up temporary folder"""
     if os.path.exists(folder_path):
         import shutil
-        shutil.rmtree(folder_path)
\ No newline at end of file
+        shutil.rmtree(folder_path)
+
+def format_match_clock(seconds):
+    """Format seconds since kick-off as MM:SS"""
+    minutes, secs = divmod(int(seconds), 60)
+    return f"{minutes:02d}:{secs:02d}"
@@ -1,52 +1,332 @@
+import math
 import os
-import cv2
 import shutil
-import streamlit as st
-from config import DEFAULT_FPS, DEFAULT_GROUP_SIZE
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from config import (
+    DEFAULT_FPS, DEFAULT_GROUP_SIZE, DECODE_WORKERS, MIN_SHARD_SECONDS, SEEK_GAP_SECONDS,
+    SHOT_GROUPING_ENABLED, SHOT_CUT_THRESHOLD, SHOT_MIN_GROUP_SIZE, SHOT_MAX_GROUP_SIZE
+)
+from progress import ProgressReporter
 
-def extract_frame_groups(video_path, output_folder, fps=DEFAULT_FPS, group_size=DEFAULT_GROUP_SIZE):
-    """Extract frames from video and group them"""
+def get_video_duration(video_path):
+    """Return the duration of a finished video file in seconds"""
+    import cv2
+    vidcap = cv2.VideoCapture(video_path)
+    fps = vidcap.get(cv2.CAP_PROP_FPS)
+    frame_count = vidcap.get(cv2.CAP_PROP_FRAME_COUNT)
+    vidcap.release()
+    if fps <= 0 or frame_count <= 0:
+        return 0.0
+    return frame_count / fps
+
+def read_frames_between(video_path, start, end, fps, output_folder, prefix):
+    """Sample frames between start and end seconds with their real timestamps.
+
+    Sample times lie on a global 1/fps grid, so adjacent ranges never sample
+    the same instant twice. Returns (frames, complete) where frames is a list
+    of (frame_path, seconds) and complete is False when the file ended before
+    the range did.
+    """
+    import cv2
+    vidcap = cv2.VideoCapture(video_path)
+    if not vidcap.isOpened():
+        return [], False
+
+    if start > 0:
+        vidcap.set(cv2.CAP_PROP_POS_MSEC, start * 1000)
+    step = 1.0 / fps
+    next_sample = math.ceil(start * fps - 1e-9) * step
+    frames = []
+    complete = False
+
+    while vidcap.grab():
+        position = vidcap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+        if position < start:
+            continue
+        if position >= end:
+            complete = True
+            break
+        if position >= next_sample:
+            success, image = vidcap.retrieve()
+            if not success:
+                break
+            frame_path = os.path.join(output_folder, f"{prefix}_frame{len(frames)}.jpg")
+            cv2.imwrite(frame_path, image)
+            frames.append((frame_path, position))
+            while next_sample <= position:
+                next_sample += step
+
+    vidcap.release()
+    return frames, complete
+
+def _iter_fixed_groups(frames, group_size):
+    """Yield fixed-size groups from a stream of (frame_path, seconds) pairs"""
+    current_group = []
+    for frame in frames:
+        current_group.append(frame)
+        if len(current_group) == group_size:
+            yield current_group
+            current_group = []
+    if current_group:
+        yield current_group
+
+def _frame_histogram(frame_path):
+    """Normalized hue/saturation histogram of a saved frame, or None if it cannot be read"""
+    import cv2
+    # Decoding the JPEG at quarter size is plenty for a color histogram
+    image = cv2.imread(frame_path, cv2.IMREAD_REDUCED_COLOR_4)
+    if image is None:
+        return None
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    histogram = cv2.calcHist([hsv], [0, 1], None, [16, 8], [0, 180, 0, 256])
+    return cv2.normalize(histogram, histogram).flatten()
+
+def iter_shot_groups(frames, min_group_size=SHOT_MIN_GROUP_SIZE, max_group_size=SHOT_MAX_GROUP_SIZE,
+                     cut_threshold=SHOT_CUT_THRESHOLD):
+    """Group a stream of time-ordered (frame_path, seconds) pairs so each group covers one camera shot.
+
+    A cut is declared between consecutive sampled frames whose color
+    histograms differ by more than cut_threshold (Bhattacharyya distance,
+    0 for identical to 1 for disjoint). A group closes at a cut once it
+    holds min_group_size frames, so very short shots join the next one, and
+    is split after max_group_size frames so a long shot still yields a
+    winner every so often. Groups are yielded as soon as they close.
+    """
+    import cv2
+    current_group = []
+    previous = None
+    for frame in frames:
+        histogram = _frame_histogram(frame[0])
+        is_cut = (
+            previous is not None and histogram is not None
+            and cv2.compareHist(previous, histogram, cv2.HISTCMP_BHATTACHARYYA) > cut_threshold
+        )
+        if current_group and (
+            (is_cut and len(current_group) >= min_group_size) or len(current_group) >= max_group_size
+        ):
+            yield current_group
+            current_group = []
+        current_group.append(frame)
+        if histogram is not None:
+            previous = histogram
+    if current_group:
+        yield current_group
+
+def iter_sampled_frames(video_path, output_folder, fps=DEFAULT_FPS, progress=None):
+    """Extract frames from video at `fps` and yield each (frame_path, seconds) pair as soon as it is saved"""
+    # OpenCV is imported lazily so the app starts without paying for it
+    import cv2
+    progress = progress or ProgressReporter()
     if os.path.exists(output_folder):
         shutil.rmtree(output_folder)
     os.makedirs(output_folder, exist_ok=True)
-    
+
     vidcap = cv2.VideoCapture(video_path)
     actual_fps = vidcap.get(cv2.CAP_PROP_FPS)
     frame_interval = int(actual_fps / fps) if actual_fps > 0 else 30
     total_frames = int(vidcap.get(cv2.CAP_PROP_FRAME_COUNT))
-    
+
     count, saved = 0, 0
-    group_index = 0
-    current_group = []
-    all_groups = []
-    
-    progress_bar = st.progress(0)
-    
-    success, image = vidcap.read()
-    while success:
-        if count % frame_interval == 0:
-            frame_filename = os.path.join(output_folder, f"group{group_index}_frame{saved}.jpg")
-            cv2.imwrite(frame_filename, image)
-            current_group.append(frame_filename)
-            saved += 1
-            
-            if saved == group_size:
-                all_groups.append(current_group)
-                current_group = []
-                saved = 0
-                group_index += 1
-        
-        success, image = vidcap.read()
-        count += 1
-        
-        # Update progress
-        progress = min(count / total_frames, 1.0)
-        progress_bar.progress(progress)
-    
-    # Add remaining frames if any
-    if current_group:
-        all_groups.append(current_group)
-    
-    vidcap.release()
-    progress_bar.empty()
-    return all_groups
\ No newline at end of file
+
+    progress.start_stage("extract")
+
+    try:
+        # Only decode the frames we keep; grab() just advances past the rest
+        success = vidcap.grab()
+        while success:
+            if count % frame_interval == 0:
+                success, image = vidcap.retrieve()
+                if not success:
+                    break
+                frame_filename = os.path.join(output_folder, f"frame{saved}.jpg")
+                cv2.imwrite(frame_filename, image)
+                timestamp = count / actual_fps if actual_fps > 0 else count / 30
+                saved += 1
+                yield frame_filename, timestamp
+
+            success = vidcap.grab()
+            count += 1
+
+            # Update progress (the reporter throttles how often this is shown)
+            progress.update("extract", count, total_frames)
+    finally:
+        vidcap.release()
+    progress.finish_stage("extract")
+
+def _iter_timestamp_groups(video_path, output_folder, timestamp_groups, first_group=0, progress=None):
+    """Decode the frames nearest to planned timestamps with one capture, yielding each group once it is complete.
+
+    first_group numbers the groups in the saved file names, so shards of one
+    plan never overwrite each other's frames.
+    """
+    import cv2
+    progress = progress or ProgressReporter()
+    targets = sorted(
+        (seconds, first_group + group_index, frame_index)
+        for group_index, group in enumerate(timestamp_groups)
+        for frame_index, seconds in enumerate(group)
+    )
+    next_target = 0
+    current_index, current_group = None, []
+
+    vidcap = cv2.VideoCapture(video_path)
+    try:
+        position = 0.0
+        last_seek = None
+        while next_target < len(targets):
+            # Seek at most once per target; imprecise seeking may land well short of it
+            if targets[next_target][0] - position > SEEK_GAP_SECONDS and last_seek != next_target:
+                vidcap.set(cv2.CAP_PROP_POS_MSEC, (targets[next_target][0] - 1) * 1000)
+                last_seek = next_target
+            if not vidcap.grab():
+                break
+            position = vidcap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+            if position < targets[next_target][0]:
+                continue
+
+            success, image = vidcap.retrieve()
+            if not success:
+                break
+            # One decoded frame serves every target that falls before it, once per group
+            served_groups = set()
+            while next_target < len(targets) and targets[next_target][0] <= position:
+                _, group_index, frame_index = targets[next_target]
+                next_target += 1
+                if group_index != current_index:
+                    if current_group:
+                        yield current_group
+                    current_index, current_group = group_index, []
+                if group_index in served_groups:
+                    continue
+                served_groups.add(group_index)
+                frame_path = os.path.join(output_folder, f"group{group_index}_frame{frame_index}.jpg")
+                cv2.imwrite(frame_path, image)
+                current_group.append((frame_path, position))
+
+            progress.update("extract", next_target, len(targets))
+
+        if current_group:
+            yield current_group
+    finally:
+        vidcap.release()
+
+def _decode_timestamp_shard(video_path, output_folder, timestamp_groups, first_group):
+    """Decode one shard of a timestamp plan in a worker process with its own capture"""
+    return list(_iter_timestamp_groups(video_path, output_folder, timestamp_groups, first_group))
+
+def _decode_shard(video_path, output_folder, shard_index, start, end, fps):
+    """Decode one time shard in a worker process with its own capture"""
+    frames, _ = read_frames_between(video_path, start, end, fps, output_folder, f"shard{shard_index}")
+    return frames
+
+def _iter_shard_results(jobs, workers, progress):
+    """Run (function, args) decode jobs in worker processes and yield their results in job order.
+
+    Jobs are submitted at most two per worker ahead of the one being
+    consumed, so the first result arrives after one short job while the
+    rest keep every core busy. Jobs not yet started are cancelled when the
+    consumer stops early.
+    """
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        pending = deque()
+        next_job = 0
+        for job_index in range(len(jobs)):
+            while next_job < len(jobs) and len(pending) < 2 * workers:
+                function, args = jobs[next_job]
+                pending.append(executor.submit(function, *args))
+                next_job += 1
+            result = pending.popleft().result()
+            progress.update("extract", job_index + 1, len(jobs))
+            yield result
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+def iter_frames_at_timestamps(video_path, output_folder, timestamp_groups, progress=None, workers=DECODE_WORKERS):
+    """Extract the frames nearest to planned timestamps, yielding each planned group once it is complete.
+
+    timestamp_groups is a time-ordered list of non-overlapping lists of
+    seconds (see audio_excitement.plan_excitement_sampling). The plan is cut
+    into shards of whole groups spanning about MIN_SHARD_SECONDS, decoded in
+    parallel processes and merged back in order, as in
+    iter_sampled_frames_parallel; a short plan or a single worker uses one
+    capture. Long gaps between targets are skipped with a seek rather than
+    decoded. Yields groups of (frame_path, seconds) pairs; groups past the
+    end of the file are dropped.
+    """
+    progress = progress or ProgressReporter()
+    if os.path.exists(output_folder):
+        shutil.rmtree(output_folder)
+    os.makedirs(output_folder, exist_ok=True)
+
+    # Shards are (index of their first group, groups)
+    shards = []
+    for group_index, group in enumerate(timestamp_groups):
+        if not shards or group[0] - shards[-1][1][0][0] >= MIN_SHARD_SECONDS:
+            shards.append((group_index, []))
+        shards[-1][1].append(group)
+
+    workers = workers or os.cpu_count() or 1
+    progress.start_stage("extract")
+    if workers < 2 or len(shards) < 2:
+        yield from _iter_timestamp_groups(video_path, output_folder, timestamp_groups, 0, progress)
+    else:
+        jobs = [
+            (_decode_timestamp_shard, (video_path, output_folder, groups, first_group))
+            for first_group, groups in shards
+        ]
+        for groups in _iter_shard_results(jobs, workers, progress):
+            yield from groups
+    progress.finish_stage("extract")
+
+def iter_sampled_frames_parallel(video_path, output_folder, fps=DEFAULT_FPS, workers=DECODE_WORKERS, progress=None):
+    """Decode short time shards in parallel processes and yield their frames in timestamp order.
+
+    The video is cut into shards of about MIN_SHARD_SECONDS, each decoded by
+    a worker process that seeks to its start. Shards are submitted at most
+    two per worker ahead of the one being consumed and are merged back in
+    order, so the first frames arrive after one short shard while decoding
+    still scales with core count. Short videos, files without a known
+    duration or a single worker fall back to iter_sampled_frames.
+    """
+    duration = get_video_duration(video_path)
+    workers = workers or os.cpu_count() or 1
+    shard_count = int(duration // MIN_SHARD_SECONDS)
+    if workers < 2 or shard_count < 2:
+        yield from iter_sampled_frames(video_path, output_folder, fps, progress)
+        return
+
+    progress = progress or ProgressReporter()
+    if os.path.exists(output_folder):
+        shutil.rmtree(output_folder)
+    os.makedirs(output_folder, exist_ok=True)
+
+    shard_length = duration / shard_count
+    jobs = [
+        (_decode_shard, (
+            video_path, output_folder, shard_index, shard_index * shard_length,
+            # The last shard runs to the end of the file in case the reported duration is short
+            float("inf") if shard_index == shard_count - 1 else (shard_index + 1) * shard_length,
+            fps
+        ))
+        for shard_index in range(shard_count)
+    ]
+    progress.start_stage("extract")
+    for frames in _iter_shard_results(jobs, workers, progress):
+        yield from sorted(frames, key=lambda frame: frame[1])
+    progress.finish_stage("extract")
+
+def iter_frame_groups(video_path, output_folder, fps=DEFAULT_FPS, group_size=DEFAULT_GROUP_SIZE, progress=None,
+                      by_shot=SHOT_GROUPING_ENABLED, workers=DECODE_WORKERS):
+    """Extract frames from video and yield each group of (frame_path, seconds) pairs as soon as it is complete.
+
+    Frames are decoded across `workers` processes (see
+    iter_sampled_frames_parallel). With by_shot, groups follow camera shots
+    (see iter_shot_groups) and group_size is ignored; otherwise every
+    group_size frames form a group.
+    """
+    frames = iter_sampled_frames_parallel(video_path, output_folder, fps, workers, progress)
+    if by_shot:
+        return iter_shot_groups(frames)
+    return _iter_fixed_groups(frames, group_size)
@@ -0,0 +1,46 @@
+import logging
+import threading
+from config import WARMUP_TRANSCRIPTION_MODEL
+
+logger = logging.getLogger(__name__)
+
+_warmup_thread = None
+_warmup_lock = threading.Lock()
+
+def _warm_up(preload_transcription_model):
+    from api_client import get_http_session
+    from config import DEPLOYMENT_URL
+
+    try:
+        # Opening one connection now saves the TLS handshake on the first real request
+        get_http_session().head(DEPLOYMENT_URL, timeout=10)
+    except Exception as e:
+        logger.warning("HTTP warm-up failed: %s", e)
+
+    try:
+        import cv2  # noqa: F401
+        import numpy  # noqa: F401
+    except Exception as e:
+        logger.warning("Import warm-up failed: %s", e)
+
+    if preload_transcription_model:
+        try:
+            from transcription_backends import get_transcription_backend
+            get_transcription_backend().load()
+        except Exception as e:
+            logger.warning("Transcription model warm-up failed: %s", e)
+
+def start_background_warmup(preload_transcription_model=WARMUP_TRANSCRIPTION_MODEL):
+    """Warm up heavy dependencies once per server process in a daemon thread.
+
+    Streamlit re-runs the script on every interaction, so this is a no-op
+    after the first call.
+    """
+    global _warmup_thread
+    with _warmup_lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(
+                target=_warm_up, args=(preload_transcription_model,), name="pipeline-warmup", daemon=True
+            )
+            _warmup_thread.start()
+    return _warmup_thread